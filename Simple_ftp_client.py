@@ -1,143 +1,1127 @@
 #!/usr/bin/env python3
 import sys
 import socket
-import struct
 import time
 import json
 import os
+import argparse
+import heapq
+import random
+import selectors
+from concurrent.futures import ProcessPoolExecutor
 
-def compute_checksum(data):
-    """Compute 16-bit checksum similar to UDP checksum"""
-    if len(data) % 2 == 1:
-        data += b'\x00'
+from checksum import compute_checksum
+from ftp_protocol import (HEADER, ACK_PACKET_TYPE, SYN_PACKET_TYPE, FIN_PACKET_TYPE, RESUME_PACKET_TYPE,
+                          PROBE_PACKET_TYPE, SIGNATURES_PACKET_TYPE, SYN, FIN, RESUME, SYN_RESUME, SYN_COMPRESS,
+                          SYN_DELTA, SYN_SACK, SYN_BATCH, SACK_BLOCK, SACK_CHECKSUM, PROTOCOLS, UNKNOWN_SIZE, SEQ_MASK,
+                          prefix_digest)
+from segment_ring import SegmentRing
+from file_source import open_source, StreamSource
+from compression import CompressingReader
+from delta import DeltaEncoder, SIGNATURES, BLOCK
+from batch import BatchReader, read_manifest
+from fec import ParityAccumulator, PARITY, REPORT
+from batch_sender import make_backend, BACKENDS
+import event_trace
+
+# Don't-fragment probing (Linux; the socket module does not export these)
+IP_MTU_DISCOVER = getattr(socket, 'IP_MTU_DISCOVER', 10)
+IP_PMTUDISC_DO = getattr(socket, 'IP_PMTUDISC_DO', 2)
+IP_MTU = getattr(socket, 'IP_MTU', 14)
+IP_UDP_OVERHEAD = 28  # IPv4 + UDP headers
+MIN_PROBE_MSS = 576 - IP_UDP_OVERHEAD - HEADER.size  # every IPv4 path carries 576-byte datagrams
+MAX_MSS = 65507 - HEADER.size  # largest UDP payload
+ETHERNET_MSS = 1500 - IP_UDP_OVERHEAD - HEADER.size  # ceiling where DF probes are not available
+
+class RTTEstimator:
+    """Retransmission timeout estimator (RFC 6298 SRTT/RTTVAR with backoff)"""
+    
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+    
+    def __init__(self, initial_rto=1.0, min_rto=0.2, max_rto=60.0):
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt = None
+        self.rttvar = None
+        self.rto = self._clamp(initial_rto)
     
-    checksum = 0
-    for i in range(0, len(data), 2):
-        word = (data[i] << 8) + data[i + 1]
-        checksum += word
-        checksum = (checksum & 0xFFFF) + (checksum >> 16)
+    def _clamp(self, rto):
+        return max(self.min_rto, min(self.max_rto, rto))
     
-    return ~checksum & 0xFFFF
+    def sample(self, rtt):
+        """Feed one RTT measurement (only from segments sent exactly once - Karn's rule)"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.reset_backoff()
+    
+    def reset_backoff(self):
+        """Recompute the RTO from SRTT/RTTVAR, dropping any exponential backoff"""
+        if self.srtt is not None:
+            self.rto = self._clamp(self.srtt + self.K * self.rttvar)
+    
+    def backoff(self):
+        """Double the RTO after a timeout"""
+        self.rto = self._clamp(self.rto * 2)
 
-def main():
-    if len(sys.argv) != 6:
-        print("Usage: python Simple_ftp_client.py <server-host-name> <server-port#> <file-name> <N> <MSS>")
-        sys.exit(1)
+class CongestionControl:
+    """Slow start / AIMD congestion window in segments, capped by the fixed window N"""
     
-    server_host = sys.argv[1]
-    server_port = int(sys.argv[2])
-    filename = sys.argv[3]
-    window_size = int(sys.argv[4])
-    mss = int(sys.argv[5])
+    def __init__(self, max_window, initial_cwnd=2):
+        self.max_window = max_window
+        self.cwnd = float(min(initial_cwnd, max_window))
+        self.ssthresh = float(max_window)
+        self.start = time.monotonic()
+        self.trajectory = [(0.0, self.cwnd)]  # (seconds since start, cwnd) at every change of whole segments
     
-    # Create UDP socket
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    client_socket.settimeout(1.0)  # 1 second timeout
+    @property
+    def window(self):
+        return max(1, min(int(self.cwnd), self.max_window))
+    
+    def _record(self, before):
+        if int(before) != int(self.cwnd):
+            self.trajectory.append((round(time.monotonic() - self.start, 6), round(self.cwnd, 2)))
+    
+    def on_ack(self, newly_acked):
+        """Slow start below ssthresh, then roughly one segment per window of ACKs"""
+        before = self.cwnd
+        if self.cwnd < self.ssthresh:
+            self.cwnd = min(self.cwnd + newly_acked, self.ssthresh)
+        else:
+            self.cwnd += newly_acked / self.cwnd
+        self.cwnd = min(self.cwnd, self.max_window)
+        self._record(before)
+    
+    def on_fast_retransmit(self, flight_size):
+        """Multiplicative decrease: halve to ssthresh and continue in congestion avoidance"""
+        before = self.cwnd
+        self.ssthresh = max(flight_size / 2, 2)
+        self.cwnd = self.ssthresh
+        self._record(before)
+    
+    def on_timeout(self, flight_size):
+        """Collapse to one segment and slow start back up to half the old flight"""
+        before = self.cwnd
+        self.ssthresh = max(flight_size / 2, 2)
+        self.cwnd = 1.0
+        self._record(before)
+
+def mss_value(text):
+    return 'auto' if text == 'auto' else int(text)
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Go-back-N / Selective Repeat reliable file transfer client over UDP",
+        usage="python Simple_ftp_client.py <server-host-name> <server-port#> <file-name> <N> <MSS|auto> [options]")
+    parser.add_argument('server_host')
+    parser.add_argument('server_port', type=int)
+    parser.add_argument('filename')
+    parser.add_argument('window_size', type=int)
+    parser.add_argument('mss', type=mss_value,
+                        help="segment payload size in bytes, or 'auto' for the largest one that crosses the "
+                             "path without IP fragmentation (found with path MTU probes)")
+    parser.add_argument('--protocol', choices=['gbn', 'sr'], default='gbn',
+                        help="gbn = Go-back-N, sr = Selective Repeat (server must use the same mode)")
+    parser.add_argument('--dupack-threshold', type=int, default=3,
+                        help="duplicate ACKs that trigger a fast retransmit of base; 0 disables (default: 3)")
+    parser.add_argument('--send-backend', choices=BACKENDS, default='auto',
+                        help="sendto = one syscall per segment; gso = batch bursts with sendmsg + UDP_SEGMENT; "
+                             "auto = gso where the kernel supports it (default)")
+    parser.add_argument('--stripes', type=int, default=1,
+                        help="split the file into this many byte ranges sent in parallel by separate "
+                             "processes and sockets (default: 1 = no striping)")
+    parser.add_argument('--congestion', choices=['none', 'aimd'], default='none',
+                        help="aimd = slow start / additive increase / multiplicative decrease congestion window "
+                             "with N as the upper bound; none = fixed window N (default)")
+    parser.add_argument('--initial-cwnd', type=int, default=2,
+                        help="initial congestion window in segments for --congestion aimd (default: 2)")
+    parser.add_argument('--initial-rto', type=float, default=1.0,
+                        help="RTO before the first RTT sample, in seconds (default: 1.0)")
+    parser.add_argument('--min-rto', type=float, default=0.2,
+                        help="lower bound on the RTO, in seconds (default: 0.2)")
+    parser.add_argument('--max-rto', type=float, default=60.0,
+                        help="upper bound on the backed-off RTO, in seconds (default: 60)")
+    parser.add_argument('--trace',
+                        help="write a binary per-segment event trace to this file (read it with event_trace.py); "
+                             "stripes write <name>.<stripe><ext> or fill a {stripe} placeholder")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted transfer: ask the server how much of the file it has "
+                             "checkpointed and send only the rest if that prefix matches ours")
+    parser.add_argument('--compress', action='store_true',
+                        help="send the file as independently zlib-compressed 256 KiB chunks, unless its first "
+                             "chunk does not compress (chunks that do not shrink are sent as they are)")
+    parser.add_argument('--compress-level', type=int, default=6, choices=range(1, 10), metavar='1-9',
+                        help="zlib level for --compress (default: 6)")
+    parser.add_argument('--fec', type=int, default=0, metavar='K',
+                        help="send an XOR parity segment after every K data segments (1/K extra bandwidth), "
+                             "from which the server rebuilds one lost segment per group without a "
+                             "retransmission; 0 = off (default)")
+    parser.add_argument('--sack', action='store_true',
+                        help="Go-back-N with selective acknowledgements: the server keeps out-of-order segments "
+                             "and lists them in SACK blocks on each ACK, and only the holes are resent")
+    parser.add_argument('--delta', action='store_true',
+                        help="fetch block signatures of the server's existing copy of the output and send only "
+                             "the parts of the file it does not already have (rsync-style)")
+    parser.add_argument('--batch', action='store_true',
+                        help="<file-name> is a manifest listing one file per line ('-' = stdin) or a directory; "
+                             "send all the files back to back in one session, to the server's output path as "
+                             "a directory")
+    args = parser.parse_args()
+    if not 0 <= args.fec <= 0xFFFF:
+        parser.error("--fec must be between 0 and 65535")
+    if args.compress and args.stripes > 1:
+        parser.error("--compress cannot be combined with --stripes")
+    if args.resume and (args.stripes > 1 or args.filename == '-'):
+        parser.error("--resume needs a regular file and cannot be combined with --stripes")
+    if args.sack and args.protocol == 'sr':
+        parser.error("--sack is for Go-back-N; Selective Repeat already ACKs each segment")
+    if args.delta and (args.stripes > 1 or args.resume or args.compress):
+        parser.error("--delta cannot be combined with --stripes, --resume or --compress")
+    if args.batch:
+        if args.stripes > 1 or args.resume or args.delta:
+            parser.error("--batch cannot be combined with --stripes, --resume or --delta")
+        try:
+            args.batch_entries = read_manifest(args.filename)
+        except (OSError, ValueError) as e:
+            parser.error(f"--batch: {e}")
+    return args
+
+def syn_packet(args, transfer_id, index, count, offset, length, file_size, flags=0):
+    """SYN describing a transfer (or one stripe of it); sizes may be None for pipes"""
+    descriptor = SYN.pack(transfer_id, index, count, offset,
+                          UNKNOWN_SIZE if length is None else length,
+                          UNKNOWN_SIZE if file_size is None else file_size,
+                          args.mss, args.window_size, PROTOCOLS.index(args.protocol),
+                          flags | (SYN_SACK if args.sack else 0), args.fec)
+    return HEADER.pack(0, compute_checksum(descriptor), SYN_PACKET_TYPE) + descriptor
+
+def handshake(client_socket, server_address, rtt, packet, attempts=10, is_reply=None, reply_name='SYN-ACK'):
+    """Send a control packet until the server answers (a SYN is echoed back as the SYN-ACK); returns the
+    reply. The first reply also seeds the RTO"""
+    for attempt in range(attempts):
+        sent = time.monotonic()
+        client_socket.sendto(packet, server_address)
+        client_socket.settimeout(rtt.rto)
+        try:
+            while True:
+                reply, _ = client_socket.recvfrom(65535)
+                if is_reply(reply) if is_reply else reply == packet:
+                    if attempt == 0:
+                        rtt.sample(time.monotonic() - sent)
+                    return reply
+        except socket.timeout:
+            rtt.backoff()
+    raise ConnectionError(f"no {reply_name} from {server_address[0]}:{server_address[1]} after {attempts} attempts")
+
+def resume_offset(args, client_socket, server_address, rtt):
+    """Ask the server for its checkpoint of args.filename; returns the offset to resume at (0 = from scratch)"""
+    file_size = os.path.getsize(args.filename)
+    descriptor = RESUME.pack(file_size, args.mss, 0, bytes(32))
+    request = HEADER.pack(0, compute_checksum(descriptor), RESUME_PACKET_TYPE) + descriptor
+    
+    def is_answer(reply):
+        answer = reply[HEADER.size:HEADER.size + RESUME.size]
+        if len(answer) != RESUME.size or HEADER.unpack_from(reply) != (0, compute_checksum(answer), RESUME_PACKET_TYPE):
+            return False
+        size, mss, _, _ = RESUME.unpack(answer)
+        return size == file_size and mss == args.mss
+    
+    reply = handshake(client_socket, server_address, rtt, request, is_reply=is_answer, reply_name='RESUME answer')
+    _, _, offset, digest = RESUME.unpack_from(reply, HEADER.size)
+    if not offset:
+        print("No checkpoint at the server; sending the whole file")
+        return 0
+    # Only trust the server's partial file if it holds exactly our first offset bytes
+    if offset > file_size or prefix_digest(args.filename, offset) != digest:
+        print(f"Server's first {offset} bytes do not match the file; sending the whole file")
+        return 0
+    print(f"Resuming at byte {offset} of {file_size} ({offset // args.mss} segments already at the server)")
+    return offset
+
+def fetch_signatures(args, client_socket, server_address, rtt, attempts=10):
+    """Fetch the block signatures of the server's copy of the output, a window of pages at a time; returns
+    (basis size, block size, packed BLOCK signatures, stats), with no signatures if there is nothing to match"""
+    start = time.monotonic()
+    per_page = max(1, (args.mss - SIGNATURES.size) // BLOCK.size)
+    
+    def request(block_size, first):
+        descriptor = SIGNATURES.pack(0, 0, block_size, first, per_page)
+        return HEADER.pack(0, compute_checksum(descriptor), SIGNATURES_PACKET_TYPE) + descriptor
+    
+    def parse(reply):
+        """(descriptor fields, signatures) of a valid answer, or None"""
+        if len(reply) < HEADER.size + SIGNATURES.size:
+            return None
+        payload = reply[HEADER.size:]
+        if HEADER.unpack_from(reply) != (0, compute_checksum(payload), SIGNATURES_PACKET_TYPE):
+            return None
+        fields = SIGNATURES.unpack_from(payload)
+        signatures = payload[SIGNATURES.size:]
+        return (fields, signatures) if len(signatures) == fields[4] * BLOCK.size else None
+    
+    def is_first_page(reply):
+        answer = parse(reply)
+        return answer is not None and answer[0][3] == 0
+    
+    # Page 0 tells the basis size and the block size the server picked
+    reply = handshake(client_socket, server_address, rtt, request(0, 0), is_reply=is_first_page,
+                      reply_name='SIGNATURES answer')
+    (basis_size, mtime, block_size, _, _), first_page = parse(reply)
+    pages = {0: first_page}
+    blocks = basis_size // block_size if block_size else 0
+    unrequested = list(range(per_page, blocks, per_page))[::-1]
+    
+    # The rest through a window of requests: each answer sends the next request, and a
+    # timeout resends every request still in flight
+    in_flight = {}  # first block of the page -> time its request was sent (None once resent)
     
-    def create_segment(data, seq_num):
-        """Create a segment with header for given data and sequence number"""
-        # Compute checksum
-        checksum = compute_checksum(data)
+    def send_next():
+        first = unrequested.pop()
+        client_socket.sendto(request(block_size, first), server_address)
+        in_flight[first] = time.monotonic()
+    
+    for _ in range(min(args.window_size, len(unrequested))):
+        send_next()
+    failures = 0
+    while in_flight:
+        client_socket.settimeout(rtt.rto)
+        try:
+            answer = parse(client_socket.recvfrom(65535)[0])
+        except socket.timeout:
+            failures += 1
+            if failures == attempts:
+                raise ConnectionError(f"no SIGNATURES answers from {server_address[0]}:{server_address[1]} "
+                                      f"after {attempts} attempts")
+            rtt.backoff()
+            for first in in_flight:
+                client_socket.sendto(request(block_size, first), server_address)
+                in_flight[first] = None
+            continue
+        if answer is None:
+            continue
+        fields, signatures = answer
+        if fields[:3] != (basis_size, mtime, block_size):
+            print("The server's copy changed while its signatures were fetched; sending the whole file")
+            return 0, 0, b'', {}
+        sent = in_flight.pop(fields[3], False)
+        if sent is False:
+            continue  # duplicate answer
+        if sent is not None:
+            rtt.sample(time.monotonic() - sent)  # Karn's rule: only pages answered on the first request
+        failures = 0
+        pages[fields[3]] = signatures
+        if unrequested:
+            send_next()
+    
+    signatures = b''.join(pages[first] for first in sorted(pages))
+    stats = {
+        'delta_basis_size': basis_size,
+        'delta_block_size': block_size,
+        'delta_signature_bytes': len(signatures),
+        'delta_signature_time': time.monotonic() - start,
+    }
+    return basis_size, block_size, signatures, stats
+
+def probe_mss(args, attempts=3):
+    """Binary-search the largest MSS whose datagrams reach the server unfragmented; returns (mss, stats)
+    
+    Probes are sent with DF set (IP_PMTUDISC_DO), so the kernel refuses sizes above
+    the path MTU it knows (interface MTU, lowered by ICMP fragmentation-needed
+    replies) and routers drop rather than fragment larger ones. A probe fits if
+    the server echoes it within attempts tries."""
+    start_time = time.monotonic()
+    probe_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe_socket.connect((args.server_host, args.server_port))
+    rtt = RTTEstimator(args.initial_rto, args.min_rto, args.max_rto)
+    dont_fragment = sys.platform.startswith('linux')
+    if dont_fragment:
+        probe_socket.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+    probes = 0
+    
+    def limit():
+        """Largest MSS the kernel's current path MTU estimate allows"""
+        if not dont_fragment:
+            return ETHERNET_MSS  # larger probes would be fragmented, and still arrive
+        return min(MAX_MSS, probe_socket.getsockopt(socket.IPPROTO_IP, IP_MTU) - IP_UDP_OVERHEAD - HEADER.size)
+    
+    def fits(mss):
+        nonlocal probes
+        packet = HEADER.pack(mss, 0, PROBE_PACKET_TYPE) + bytes(mss)
+        for attempt in range(attempts):
+            probes += 1
+            sent = time.monotonic()
+            try:
+                probe_socket.send(packet)
+                probe_socket.settimeout(rtt.rto)
+                while True:
+                    if probe_socket.recv(64) == packet[:HEADER.size]:
+                        if attempt == 0:
+                            rtt.sample(time.monotonic() - sent)
+                        return True
+            except socket.timeout:
+                continue
+            except ConnectionRefusedError:
+                raise ConnectionError(f"{args.server_host}:{args.server_port} refused the path MTU probe")
+            except OSError:
+                return False  # EMSGSIZE: above the path MTU
+        return False
+    
+    try:
+        if not fits(MIN_PROBE_MSS):
+            raise ConnectionError(f"no reply to path MTU probes from {args.server_host}:{args.server_port}")
+        low, high = MIN_PROBE_MSS, limit()
+        if not fits(high):
+            while low < high:
+                mid = (low + high + 1) // 2
+                if fits(mid):
+                    low = mid
+                else:
+                    high = min(mid - 1, limit())
+        mss = max(low, min(high, limit()))
+    finally:
+        probe_socket.close()
+    
+    return mss, {
+        'mss_auto': True,
+        'path_mtu': mss + HEADER.size + IP_UDP_OVERHEAD,
+        'pmtu_probes': probes,
+        'pmtu_probe_time': time.monotonic() - start_time,
+    }
+
+class WindowSender:
+    """Event-driven Go-back-N / Selective Repeat sender on one non-blocking UDP socket
+    
+    One selector loop interleaves filling the window (and flushing segments the
+    socket buffer could not take yet), draining every queued ACK, and firing
+    retransmission timers. Timers are explicit deadlines rather than socket
+    receive timeouts, so ACKs that acknowledge nothing new never push them back:
+    - Go-back-N: a single timer for the oldest unACKed segment, (re)started when
+      that segment is (re)transmitted or becomes the oldest
+    - Selective Repeat: one timer per outstanding segment, kept in a heap
+    With --sack, Go-back-N ACKs also carry SACK blocks. SACKed segments are not
+    resent, and fast retransmit resends only the holes below the highest SACKed one.
+    With --fec K every K new segments are followed by a parity segment, queued
+    behind them. A FIN goes out as soon as the last segment has been sent, with its own
+    timer. The server echoes it (FIN-ACK) once every segment is delivered, so
+    the FIN-ACK also covers data ACKs that were lost at the end.
+    """
+    
+    # ACKs handled per wakeup before the loop goes back to sending and timers
+    ACK_BATCH = 256
+    # FINs sent with nothing else outstanding before giving up on the FIN-ACK
+    FIN_ATTEMPTS = 6
+    
+    def __init__(self, args, client_socket, source, rtt, trace=None):
+        self.args = args
+        self.window_size = args.window_size
+        self.mss = args.mss
+        self.selective_repeat = args.protocol == 'sr'
+        self.source = source
+        self.rtt = rtt
+        self.trace = trace  # EventTrace, or None when tracing is off
+        
+        client_socket.setblocking(False)
+        self.sock = client_socket
+        self.selector = selectors.DefaultSelector()
+        self.events = selectors.EVENT_READ
+        self.selector.register(client_socket, self.events)
+        
+        # Window bursts and retransmissions go out through a (possibly batched) transmit backend
+        self.transmit = make_backend(args.send_backend, client_socket, (args.server_host, args.server_port))
+        self.pending = []  # sequence numbers queued while the socket buffer is full
+        self.retry_at = None  # when to retry pending after ENOBUFS (write-readiness would not tell)
+        
+        # XOR parity over each group of fec_size new segments (first transmissions only)
+        self.fec_size = args.fec
+        self.parity = ParityAccumulator()
+        self.pending_parity = []  # parity segments waiting behind pending
+        self.parity_segments = 0
+        self.parity_bytes = 0
+        self.segments_rebuilt = 0  # reported by the server in the FIN-ACK
+        
+        # Unknown for pipes until the end of the input is reached
+        self.total_segments = None
+        if source.size is not None:
+            self.total_segments = (source.size + self.mss - 1) // self.mss
+        
+        # Sent but unACKed segments live in ring slots indexed by seq % window_size
+        self.base = 0
+        self.next_seq_num = 0
+        self.ring = SegmentRing(self.window_size, self.mss)
+        self.sent_at = self.ring.sent_at
+        
+        # Congestion window (in segments, at most N) when congestion control is enabled
+        self.congestion = CongestionControl(self.window_size, args.initial_cwnd) if args.congestion == 'aimd' else None
+        self.send_window = self.congestion.window if self.congestion else self.window_size
+        
+        # Go-back-N: start time of the timer for the oldest unACKed segment
+        self.base_timer = None
+        
+        # Selective Repeat: per-segment timers. The heap holds (deadline, seq);
+        # entries whose deadline no longer matches deadlines[seq] are stale and skipped.
+        self.acked = set()  # ACKed segments above base
+        self.deadlines = {}
+        self.timer_heap = []
+        
+        # Go-back-N with --sack: SACKed segments above base also go in acked (so they are never
+        # resent); sack_high is one past the highest, and holes below holes_resent were resent
+        # in the current recovery
+        self.sack = args.sack
+        self.sack_high = 0
+        self.holes_resent = 0
+        self.sacked_segments = 0
+        
+        # Fast retransmit / fast recovery state
+        self.dup_acks = 0  # GBN: ACKs repeating base - 1; SR: ACKs received above base
+        self.fast_retx_base = None  # base last resent; its stale duplicate ACKs are absorbed
+        self.in_recovery = False
+        self.recover = 0  # highest segment outstanding when recovery began
         
-        # Create segment header
-        header = struct.pack('!I', seq_num)  # 32-bit sequence number
-        header += struct.pack('!H', checksum)  # 16-bit checksum
-        header += struct.pack('!H', 0b0101010101010101)  # 16-bit data packet type
+        # Go-back-N: segments in [resend_next, resend_end) still to be resent after a timeout or
+        # fast retransmit. fill_window() resends them ahead of new data, within the send window,
+        # so a reduced congestion window also limits the retransmission burst.
+        self.resend_next = 0
+        self.resend_end = 0
+        self.resend_cause = event_trace.CAUSE_TIMEOUT
         
-        return header + data
+        # FIN / FIN-ACK teardown
+        self.fin_packet = None
+        self.fin_deadline = None
+        self.fin_attempts = 0  # consecutive FINs with every segment ACKed
+        self.fin_acked = False
+        self.finished = False
+        
+        # Statistics tracking
+        self.timeout_count = 0
+        self.timeout_retransmissions = 0
+        self.fast_retransmit_count = 0
+        self.fast_retransmissions = 0
+        self.fast_recovery_count = 0
+    
+    def arm_timer(self, seq, now):
+        self.deadlines[seq] = now + self.rtt.rto
+        heapq.heappush(self.timer_heap, (self.deadlines[seq], seq))
     
-    # Read file data upfront
-    with open(filename, 'rb') as f:
-        file_data = f.read()
+    def earliest_deadline(self):
+        while self.timer_heap and self.deadlines.get(self.timer_heap[0][1]) != self.timer_heap[0][0]:
+            heapq.heappop(self.timer_heap)
+        return self.timer_heap[0][0] if self.timer_heap else None
     
-    total_segments = (len(file_data) + mss - 1) // mss
+    def next_deadline(self):
+        """When the next retransmission timer (segments or FIN) expires, or None if nothing is outstanding"""
+        if self.selective_repeat:
+            deadline = self.earliest_deadline()
+        elif self.base < self.next_seq_num:
+            deadline = self.base_timer + self.rtt.rto
+        else:
+            deadline = None
+        if self.fin_deadline is not None and (deadline is None or self.fin_deadline < deadline):
+            deadline = self.fin_deadline
+        return deadline
     
-    def create_segment_from_data(seq_num):
-        """Create segment for given sequence number from file data"""
-        start = seq_num * mss
-        end = min(start + mss, len(file_data))
-        data = file_data[start:end]
-        return create_segment(data, seq_num)
+    def send_fin(self, now):
+        if self.fin_packet is None:
+            descriptor = FIN.pack(self.total_segments, self.source.size)
+            self.fin_packet = (HEADER.pack(self.total_segments & SEQ_MASK, compute_checksum(descriptor), FIN_PACKET_TYPE)
+                               + descriptor)
+        try:
+            self.sock.sendto(self.fin_packet, (self.args.server_host, self.args.server_port))
+        except BlockingIOError:
+            pass  # the FIN timer retries
+        if self.base == self.total_segments:
+            self.fin_attempts += 1
+        self.fin_deadline = now + self.rtt.rto * 2 ** self.fin_attempts
     
-    # Go-back-N protocol with sliding window buffer
-    base = 0
-    next_seq_num = 0
-    window_buffer = {}  # Dictionary to store sent but unACKed segments
+    def queue(self, seqs, now):
+        """Transmit already-built segments, keeping whatever the socket cannot take yet"""
+        if self.base in seqs:
+            self.base_timer = now
+        self.pending.extend(seqs)
+        if self.retry_at is None:
+            self.flush()
     
-    # Statistics tracking
-    timeout_count = 0
-    start_time = time.time()
+    def flush(self):
+        # Segments ACKed while they were waiting no longer need to go out
+        queued = [seq for seq in self.pending if seq >= self.base and seq not in self.acked]
+        sent = self.transmit.send([self.ring.segment(seq) for seq in queued])
+        self.pending = queued[sent:]
+        while self.pending_parity and not self.pending:
+            try:
+                self.sock.sendto(self.pending_parity[0], (self.args.server_host, self.args.server_port))
+            except OSError as e:
+                self.transmit.send_stopped(e, 0)
+                break
+            del self.pending_parity[0]
+        waiting = bool(self.pending or self.pending_parity)
+        self.retry_at = time.monotonic() + self.transmit.backoff if waiting and self.transmit.backoff else None
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if waiting and self.retry_at is None else 0)
+        if events != self.events:
+            self.selector.modify(self.sock, events)
+            self.events = events
     
-    while True:
-        # Send new packets within window
-        while next_seq_num < base + window_size and next_seq_num < total_segments:
-            # Create and send segment
-            segment = create_segment_from_data(next_seq_num)
-            client_socket.sendto(segment, (server_host, server_port))
+    def schedule_resend(self, start, end, cause):
+        """Go-back-N: resend [start, end) (minus SACKed segments) as the send window allows"""
+        if self.resend_next < self.resend_end and cause == event_trace.CAUSE_FAST:
+            end = max(end, self.resend_end)  # more holes while the earlier ones are still going out
+            start = min(start, self.resend_next)
+        self.resend_next = start
+        self.resend_end = end
+        self.resend_cause = cause
+    
+    def resend_within_window(self, now):
+        seq = max(self.resend_next, self.base)
+        limit = min(self.resend_end, self.base + self.send_window)
+        resend = [s for s in range(seq, limit) if s not in self.acked]
+        self.resend_next = max(seq, limit)
+        if not resend:
+            return
+        # Retransmitted segments no longer give valid RTT samples
+        for seq in resend:
+            self.sent_at[seq % self.window_size] = None
+        if self.resend_cause == event_trace.CAUSE_FAST:
+            self.fast_retransmissions += len(resend)
+        else:
+            self.timeout_retransmissions += len(resend)
+        if self.trace:
+            self.trace_retransmit(resend, self.resend_cause)
+        self.queue(resend, now)
+    
+    def fill_window(self):
+        """Build and send new segments up to the send window as one burst"""
+        burst = []
+        now = time.monotonic()
+        if self.resend_next < self.resend_end:
+            self.resend_within_window(now)
+        while (self.next_seq_num < self.base + self.send_window
+               and (self.total_segments is None or self.next_seq_num < self.total_segments)):
+            payload = self.source.view(self.next_seq_num * self.mss, self.mss)
+            if self.total_segments is None and self.source.size is not None:
+                self.total_segments = (self.source.size + self.mss - 1) // self.mss
+                if not payload:
+                    break
+            
+            self.ring.fill(self.next_seq_num, payload)
+            if self.trace:
+                self.trace.record(event_trace.SEND, self.next_seq_num, len(payload))
+            if self.fec_size:
+                self.parity.add(payload)
+            del payload  # drop the mmap view so the source can be closed
             
-            # Buffer the segment for potential retransmission
-            window_buffer[next_seq_num] = segment
-            next_seq_num += 1
+            self.sent_at[self.next_seq_num % self.window_size] = now
+            if self.selective_repeat:
+                self.arm_timer(self.next_seq_num, now)
+            burst.append(self.next_seq_num)
+            self.next_seq_num += 1
+            if self.fec_size and (self.parity.count == self.fec_size or self.next_seq_num == self.total_segments):
+                # The parity goes out right behind its group, ahead of the next group's segments
+                self.close_parity_group()
+                self.queue(burst, now)
+                burst = []
+        if self.fec_size and self.parity.count and self.next_seq_num == self.total_segments:
+            self.close_parity_group()  # end of a pipe found after the group's last segment
+        if burst or self.pending_parity:
+            self.queue(burst, now)
+        if self.next_seq_num == self.total_segments and self.fin_packet is None:
+            self.send_fin(now)
+    
+    def close_parity_group(self):
+        packet = self.parity.packet(self.next_seq_num - self.parity.count)
+        self.pending_parity.append(packet)
+        self.parity_segments += 1
+        self.parity_bytes += len(packet) - HEADER.size
+        self.parity = ParityAccumulator()
+    
+    def drain_acks(self):
+        """Process queued ACKs until the socket is empty (or ACK_BATCH were handled)"""
+        for _ in range(self.ACK_BATCH):
+            try:
+                ack_packet = self.sock.recv(1024)
+            except (BlockingIOError, ConnectionRefusedError):
+                return
+            if len(ack_packet) >= 8:
+                self.handle_ack(ack_packet)
+    
+    def handle_ack(self, ack_packet):
+        ack_seq_num, zeros, ack_type = HEADER.unpack_from(ack_packet)
         
-        # Check if we're done - all segments sent AND all ACKed
-        if base == total_segments:
-            break
+        if ack_type == FIN_PACKET_TYPE:
+            if len(ack_packet) == HEADER.size and ack_seq_num == 0 and zeros == 0:
+                raise ConnectionResetError("the server has no session for this transfer (it was closed for "
+                                           "being idle); start again, or continue with --resume")
+            if self.fin_packet is not None and ack_packet[:len(self.fin_packet)] == self.fin_packet:
+                if len(ack_packet) >= len(self.fin_packet) + REPORT.size:
+                    (self.segments_rebuilt,) = REPORT.unpack_from(ack_packet, len(self.fin_packet))
+                self.fin_acked = self.finished = True
+                self.base = self.total_segments  # every segment was delivered
+            return
         
-        # Wait for ACK
-        try:
-            ack_packet, _ = client_socket.recvfrom(1024)
+        # Verify it's an ACK packet (with SACK, the zeros count the SACK blocks)
+        if not (ack_type == ACK_PACKET_TYPE and (zeros == 0 or self.sack)):
+            return
+        
+        # Map the 32-bit wire sequence number back into the outstanding window
+        window_offset = (ack_seq_num - self.base) & SEQ_MASK
+        now = time.monotonic()
+        congestion = self.congestion
+        
+        trace = self.trace
+        if window_offset >= self.next_seq_num - self.base:
+            # Go-back-N receiver repeats its last in-order ACK on out-of-order arrivals
+            if not self.selective_repeat and ack_seq_num == (self.base - 1) & SEQ_MASK:
+                self.dup_acks += 1
+                if trace:
+                    trace.record(event_trace.ACK, ack_seq_num, self.base, event_trace.CAUSE_DUPLICATE)
+            elif trace:
+                trace.record(event_trace.ACK, ack_seq_num, self.base, event_trace.CAUSE_STALE)
+        elif self.selective_repeat:
+            ack_seq_num = self.base + window_offset
             
-            # Parse ACK
-            if len(ack_packet) >= 8:
-                ack_seq_num = struct.unpack('!I', ack_packet[0:4])[0]
-                zeros = struct.unpack('!H', ack_packet[4:6])[0]
-                ack_type = struct.unpack('!H', ack_packet[6:8])[0]
-                
-                # Verify it's an ACK packet
-                if ack_type == 0b1010101010101010 and zeros == 0:
-                    # Remove ACKed segments from buffer
-                    for seq in range(base, ack_seq_num + 1):
-                        if seq in window_buffer:
-                            del window_buffer[seq]
-                    
-                    # Move window
-                    base = ack_seq_num + 1
+            # Individual ACK: mark the segment and slide over the ACKed prefix
+            if ack_seq_num in self.acked:
+                if trace:
+                    trace.record(event_trace.ACK, ack_seq_num, self.base, event_trace.CAUSE_DUPLICATE)
+            else:
+                first_sent = self.sent_at[ack_seq_num % self.window_size]
+                if first_sent is not None:
+                    self.rtt.sample(now - first_sent)
+                else:
+                    self.rtt.reset_backoff()
+                self.acked.add(ack_seq_num)
+                del self.deadlines[ack_seq_num]
+                if congestion and not self.in_recovery:
+                    congestion.on_ack(1)
+                while self.base in self.acked:
+                    self.acked.remove(self.base)
+                    self.base += 1
+                self.dup_acks = len(self.acked)
+                if trace:
+                    trace.record(event_trace.ACK, ack_seq_num, self.base, event_trace.CAUSE_NEW)
+        else:
+            ack_seq_num = self.base + window_offset
+            
+            # Take an RTT sample if the ACKed segment was only sent once
+            # New data was ACKed, so any backoff is cleared either way. A receiver that
+            # buffers (SACK, FEC) jumps the cumulative ACK over segments that arrived earlier,
+            # so the segment that filled the gap at base is the one this ACK answers.
+            answered = self.base if self.sack or self.fec_size else ack_seq_num
+            first_sent = self.sent_at[answered % self.window_size]
+            if first_sent is not None:
+                self.rtt.sample(now - first_sent)
+            else:
+                self.rtt.reset_backoff()
+            if congestion and not self.in_recovery:
+                congestion.on_ack(ack_seq_num + 1 - self.base)
+            
+            # Move window - ACKed slots are simply reused; the next oldest segment's timer starts now
+            if self.acked:
+                self.acked.difference_update(range(self.base, ack_seq_num + 1))
+            self.base = ack_seq_num + 1
+            self.base_timer = now
+            self.dup_acks = 0
+            if trace:
+                trace.record(event_trace.ACK, ack_seq_num, self.base, event_trace.CAUSE_NEW)
         
-        except socket.timeout:
-            # Timeout - retransmit all packets in window
-            print(f"Timeout, sequence number = {base}")
-            timeout_count += 1
+        self.source.release(self.base * self.mss)
+        if zeros and self.sack:
+            self.mark_sacked(ack_packet, zeros)
+        
+        if self.in_recovery and self.base > self.recover:
+            self.in_recovery = False
+        
+        # Fast retransmit once enough duplicate ACKs point at a hole at base. Within a recovery
+        # (until everything outstanding when it began is ACKed) that is a hole a partial ACK
+        # left, and only it is resent (NewReno)
+        if 0 < self.args.dupack_threshold <= self.dup_acks and self.fast_retx_base != self.base:
+            if self.in_recovery:
+                self.resend_base(now)
+            else:
+                self.fast_retransmit(now)
+        elif self.in_recovery and self.sack_high > self.holes_resent:
+            self.resend_holes(now)  # SACKs above further holes during recovery
+        
+        if congestion:
+            self.send_window = congestion.window
+    
+    def mark_sacked(self, ack_packet, count):
+        """Add the segments in the ACK's SACK blocks to the scoreboard"""
+        blocks = ack_packet[HEADER.size:HEADER.size + count * SACK_BLOCK.size]
+        checksum = ack_packet[HEADER.size + len(blocks):HEADER.size + len(blocks) + SACK_CHECKSUM.size]
+        if len(checksum) != SACK_CHECKSUM.size or SACK_CHECKSUM.unpack(checksum)[0] != compute_checksum(blocks):
+            return  # a garbled block could mark a lost segment as received
+        outstanding = self.next_seq_num - self.base
+        for start, end in SACK_BLOCK.iter_unpack(blocks):
+            first = (start - self.base) & SEQ_MASK
+            last = (end - self.base) & SEQ_MASK
+            if not first < last <= outstanding:
+                continue  # below base by now, or garbled
+            first += self.base
+            last += self.base
+            # Blocks only grow until delivered, so one already marked end to end is unchanged
+            if first in self.acked and last - 1 in self.acked:
+                continue
+            for seq in range(first, last):
+                if seq not in self.acked:
+                    self.acked.add(seq)
+                    self.sacked_segments += 1
+            self.sack_high = max(self.sack_high, last)
+    
+    def resend_holes(self, now):
+        """Resend the unSACKed segments below the highest SACKed one that this recovery has not resent yet"""
+        start = max(self.base, self.holes_resent)
+        self.holes_resent = max(self.sack_high, self.base + 1)
+        self.schedule_resend(start, self.holes_resent, event_trace.CAUSE_FAST)
+        self.resend_within_window(now)
+    
+    def fast_retransmit(self, now):
+        """Start a recovery at base: SR resends base, Go-back-N the SACK holes or everything from base"""
+        base = self.base
+        self.in_recovery = True
+        self.recover = self.next_seq_num - 1
+        self.fast_recovery_count += 1
+        self.holes_resent = base
+        if self.congestion:
+            self.congestion.on_fast_retransmit(self.next_seq_num - base)
+            self.send_window = self.congestion.window
+        
+        if self.selective_repeat:
+            self.resend_base(now)
+            return
+        print(f"Fast retransmit, sequence number = {base}")
+        self.fast_retx_base = base
+        self.fast_retransmit_count += 1
+        if self.sack:
+            self.resend_holes(now)
+            return
+        
+        # The GBN receiver discarded everything after base, which goes again as the
+        # (now reduced) window allows
+        self.schedule_resend(base, self.next_seq_num, event_trace.CAUSE_FAST)
+        self.resend_within_window(now)
+    
+    def resend_base(self, now):
+        """Resend just base, the next hole of the current recovery"""
+        base = self.base
+        print(f"Fast retransmit, sequence number = {base}")
+        self.fast_retx_base = base
+        self.fast_retransmit_count += 1
+        self.sent_at[base % self.window_size] = None
+        if self.selective_repeat:
+            self.arm_timer(base, now)
+        self.fast_retransmissions += 1
+        if self.trace:
+            self.trace_retransmit([base], event_trace.CAUSE_FAST)
+        self.queue([base], now)
+    
+    def trace_retransmit(self, seqs, cause):
+        lengths = self.ring.lengths
+        for seq in seqs:
+            self.trace.record(event_trace.RETRANSMIT, seq, lengths[seq % self.window_size] - HEADER.size, cause)
+    
+    def check_timers(self, now):
+        """Retransmit whatever has timed out by now"""
+        if self.fin_deadline is not None and now >= self.fin_deadline:
+            if self.base == self.total_segments and self.fin_attempts >= self.FIN_ATTEMPTS:
+                print("No FIN-ACK from the server; all data was ACKed, closing anyway")
+                self.finished = True
+                return
+            self.send_fin(now)
+        if self.base == self.total_segments:
+            return
+        if self.selective_repeat:
+            # Retransmit only the segments whose own timer expired
+            expired = []
+            while (deadline := self.earliest_deadline()) is not None and deadline <= now:
+                expired.append(heapq.heappop(self.timer_heap)[1])
+            if not expired:
+                return
+            self.rtt.backoff()
+            if self.congestion:
+                self.congestion.on_timeout(self.next_seq_num - self.base)
+            for seq in expired:
+                print(f"Timeout, sequence number = {seq}")
+                self.timeout_count += 1
+                self.timeout_retransmissions += 1
+                self.sent_at[seq % self.window_size] = None
+                self.arm_timer(seq, now)
+            if self.trace:
+                self.trace_retransmit(expired, event_trace.CAUSE_TIMEOUT)
+            self.queue(expired, now)
+        else:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                return
+            
+            # Retransmit from base
+            print(f"Timeout, sequence number = {self.base}")
+            self.timeout_count += 1
+            self.rtt.backoff()
+            if self.congestion:
+                self.congestion.on_timeout(self.next_seq_num - self.base)
+                self.send_window = self.congestion.window
+            self.in_recovery = False
+            self.fast_retx_base = self.base
             
-            # Retransmit all segments in the window
-            for seq in range(base, next_seq_num):
-                if seq in window_buffer:
-                    client_socket.sendto(window_buffer[seq], (server_host, server_port))
+            # Go back to base; with congestion control only the collapsed window goes out now
+            # and the rest follows as ACKs open it (SACKed segments are not resent)
+            self.holes_resent = self.next_seq_num
+            self.schedule_resend(self.base, self.next_seq_num, event_trace.CAUSE_TIMEOUT)
+            self.resend_within_window(now)
+        if self.congestion:
+            self.send_window = self.congestion.window
+    
+    def run(self):
+        """Send the whole source; returns once the FIN is ACKed (or given up on)"""
+        self.fill_window()
+        while not self.finished:
+            deadline = self.next_deadline()
+            if self.retry_at is not None and (deadline is None or self.retry_at < deadline):
+                deadline = self.retry_at
+            timeout = self.rtt.rto if deadline is None else max(deadline - time.monotonic(), 0)
+            for _, events in self.selector.select(timeout):
+                if events & selectors.EVENT_READ:
+                    self.drain_acks()
+                if events & selectors.EVENT_WRITE:
+                    self.flush()
+            if self.retry_at is not None and time.monotonic() >= self.retry_at:
+                self.flush()
+            self.check_timers(time.monotonic())
+            self.fill_window()
+        self.selector.close()
+
+def send_file(args, offset=0, length=None, syn=None, trace_path=None):
+    """Send args.filename (or its byte range [offset, offset + length)) and return the stats record"""
+    server_host = args.server_host
+    server_port = args.server_port
+    
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rtt = RTTEstimator(args.initial_rto, args.min_rto, args.max_rto)
+    
+    start_time = time.time()
+    
+    resumed_from = 0
+    if args.resume and syn is None:
+        resumed_from = offset = resume_offset(args, client_socket, (server_host, server_port), rtt)
+    
+    signatures = b''
+    signature_stats = {}
+    if args.delta and syn is None:
+        basis_size, block_size, signatures, signature_stats = fetch_signatures(
+            args, client_socket, (server_host, server_port), rtt)
+        if not signatures:
+            print("No copy at the server to match against; sending the whole file" if not basis_size else
+                  "The server's copy is smaller than one block; sending the whole file")
+    
+    # Stream the file: regular files are mmap'ed, pipes ('-' = stdin) are read ahead,
+    # so only the in-flight window needs to be in memory. A batch is one stream of
+    # every file in the manifest, sent like a pipe.
+    batch = None
+    if args.batch:
+        batch = BatchReader(args.batch_entries)
+        source = StreamSource(batch)
+    else:
+        source = open_source(args.filename, offset, length)
+    data_size = source.size
+    
+    # Compressed transfers send the framed stream instead, which (like a pipe) has
+    # no length until it has all been read
+    compressor = None
+    if args.compress:
+        compressor = CompressingReader(source, args.compress_level)
+        if compressor.worthwhile():
+            source = StreamSource(compressor)
+        else:
+            print("The data does not compress; sending it uncompressed")
+            compressor = None
+    
+    # Delta transfers send ops against the server's copy, also as a stream
+    encoder = None
+    if signatures:
+        encoder = DeltaEncoder(source, block_size, signatures)
+        source = StreamSource(encoder)
+    
+    # The SYN gives the server the size, MSS, window and protocol (and, for a stripe
+    # of a striped transfer or a resumed transfer, where its bytes belong)
+    if syn is None:
+        file_size = None if data_size is None else offset + data_size
+        flags = ((SYN_RESUME if resumed_from else 0) | (SYN_COMPRESS if compressor else 0)
+                 | (SYN_DELTA if encoder else 0) | (SYN_BATCH if batch else 0))
+        syn = syn_packet(args, random.getrandbits(32), 0, 1, offset, source.size, file_size, flags)
+    handshake(client_socket, (server_host, server_port), rtt, syn)
+    
+    trace_path = trace_path or args.trace
+    trace = event_trace.EventTrace(trace_path, event_trace.CLIENT) if trace_path else None
+    sender = WindowSender(args, client_socket, source, rtt, trace)
+    try:
+        sender.run()
+    finally:
+        if trace:
+            trace.close()
     
     end_time = time.time()
     elapsed_time = end_time - start_time
     
     client_socket.close()
+    source.close()
     
-    # Save statistics to JSON file
-    stats = {
-        'window_size': window_size,
-        'mss': mss,
-        'file_size': len(file_data),
-        'total_segments': total_segments,
+    congestion = sender.congestion
+    transmit = sender.transmit
+    if compressor:
+        data_size = compressor.raw_bytes
+        compression_stats = compressor.stats()
+    else:
+        data_size = encoder.raw_bytes if encoder else source.size
+        compression_stats = {'compression': 'none', 'compressed_bytes': data_size, 'compression_ratio': 1.0,
+                             'compress_cpu_time': 0.0}
+    batch_stats = {'batch_files': 0, 'batch_bytes': 0, 'batch_stream_bytes': 0}
+    if batch:
+        batch_stats = batch.stats()
+        data_size = batch.file_bytes
+    delta_stats = {'delta': encoder is not None, 'delta_basis_size': 0, 'delta_block_size': 0,
+                   'delta_signature_bytes': 0, 'delta_signature_time': 0.0, **signature_stats}
+    if encoder:
+        delta_stats.update(encoder.stats())
+    return {
+        'protocol': args.protocol,
+        'congestion': args.congestion,
+        'window_size': args.window_size,
+        'mss': args.mss,
+        'file_size': data_size,
+        'total_segments': sender.total_segments,
         'elapsed_time': elapsed_time,
-        'timeout_count': timeout_count,
+        'throughput_mbps': (data_size or 0) * 8 / elapsed_time / 1e6 if elapsed_time else 0,
+        'timeout_count': sender.timeout_count,
+        'timeout_retransmissions': sender.timeout_retransmissions,
+        'fast_retransmit_count': sender.fast_retransmit_count,
+        'fast_retransmissions': sender.fast_retransmissions,
+        'fast_recovery_count': sender.fast_recovery_count,
+        'fin_acked': sender.fin_acked,
+        'resumed_from': resumed_from,
+        'fec_group_size': args.fec,
+        'fec_parity_segments': sender.parity_segments,
+        'fec_parity_bytes': sender.parity_bytes,
+        'fec_overhead': sender.parity_bytes / source.size if source.size else 0.0,
+        'fec_segments_rebuilt': sender.segments_rebuilt,
+        'sack': args.sack,
+        'sacked_segments': sender.sacked_segments,
+        **compression_stats,
+        **delta_stats,
+        'batch': batch is not None,
+        **batch_stats,
+        'send_backend': transmit.name,
+        'send_syscalls': transmit.syscalls,
+        'datagrams_sent': transmit.datagrams,
+        'final_rto': rtt.rto,
+        'srtt': rtt.srtt,
+        'cwnd_trajectory': congestion.trajectory if congestion else None,
         'server': f"{server_host}:{server_port}",
         'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
     }
+
+def send_striped(args):
+    """Send the file as args.stripes byte ranges in parallel processes; returns the aggregate stats record"""
+    file_size = os.path.getsize(args.filename)
+    total_segments = (file_size + args.mss - 1) // args.mss
+    
+    # Stripe boundaries fall on segment boundaries
+    segments_per_stripe = (total_segments + args.stripes - 1) // args.stripes or 1
+    stripe_ranges = []
+    for offset in range(0, max(file_size, 1), segments_per_stripe * args.mss):
+        stripe_ranges.append((offset, min(segments_per_stripe * args.mss, file_size - offset)))
+    
+    transfer_id = random.getrandbits(32)
+    packets = [syn_packet(args, transfer_id, index, len(stripe_ranges), offset, length, file_size)
+               for index, (offset, length) in enumerate(stripe_ranges)]
+    
+    # Separate processes (and sockets) per stripe, so the senders do not share the GIL
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=len(stripe_ranges)) as pool:
+        futures = [pool.submit(send_file, args, offset, length, packet,
+                               args.trace and event_trace.numbered_path(args.trace, index, stripe=index))
+                   for index, ((offset, length), packet) in enumerate(zip(stripe_ranges, packets))]
+        stripe_stats = [future.result() for future in futures]
+    elapsed_time = time.time() - start_time
+    
+    stats = dict(stripe_stats[0])
+    for key in ('total_segments', 'timeout_count', 'timeout_retransmissions', 'fast_retransmit_count',
+                'fast_retransmissions', 'fast_recovery_count', 'send_syscalls', 'datagrams_sent',
+                'fec_parity_segments', 'fec_parity_bytes', 'fec_segments_rebuilt', 'sacked_segments'):
+        stats[key] = sum(s[key] for s in stripe_stats)
+    stats.update({
+        'file_size': file_size,
+        'elapsed_time': elapsed_time,
+        'throughput_mbps': file_size * 8 / elapsed_time / 1e6 if elapsed_time else 0,
+        'final_rto': max(s['final_rto'] for s in stripe_stats),
+        'fin_acked': all(s['fin_acked'] for s in stripe_stats),
+        'fec_overhead': stats['fec_parity_bytes'] / file_size if file_size else 0.0,
+        'srtt': None,
+        'stripes': len(stripe_ranges),
+        'stripe_stats': [{
+            'stripe': index,
+            'offset': offset,
+            'length': length,
+            'elapsed_time': s['elapsed_time'],
+            'throughput_mbps': s['throughput_mbps'],
+            'timeout_count': s['timeout_count'],
+            'fast_retransmit_count': s['fast_retransmit_count'],
+            'srtt': s['srtt'],
+        } for index, ((offset, length), s) in enumerate(zip(stripe_ranges, stripe_stats))],
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    return stats
+
+def main():
+    args = parse_args()
+    
+    probe_stats = {'mss_auto': False, 'path_mtu': None, 'pmtu_probes': 0, 'pmtu_probe_time': 0.0}
+    if args.mss == 'auto':
+        args.mss, probe_stats = probe_mss(args)
+        if args.fec:
+            args.mss -= PARITY.size  # parity segments carry a descriptor on top of the MSS
+        print(f"Path MTU {probe_stats['path_mtu']} bytes: using MSS {args.mss} "
+              f"({probe_stats['pmtu_probes']} probes in {probe_stats['pmtu_probe_time']:.3f} seconds)")
+    
+    if args.stripes > 1:
+        stats = send_striped(args)
+    else:
+        stats = send_file(args)
+    stats.update(probe_stats)
     
     # Append to stats file
     stats_file = 'transfer_stats.jsonl'
     with open(stats_file, 'a') as f:
         f.write(json.dumps(stats) + '\n')
     
-    print(f"\nTransfer complete!")
-    print(f"Time: {elapsed_time:.2f} seconds")
-    print(f"Timeouts: {timeout_count}")
+    print("\nTransfer complete!")
+    print(f"Time: {stats['elapsed_time']:.2f} seconds ({stats['throughput_mbps']:.2f} Mbit/s)")
+    if stats.get('resumed_from'):
+        print(f"Resumed at byte {stats['resumed_from']}: sent {stats['file_size']} remaining bytes")
+    for stripe in stats.get('stripe_stats', []):
+        print(f"  Stripe {stripe['stripe']}: {stripe['length']} bytes at offset {stripe['offset']}, "
+              f"{stripe['elapsed_time']:.2f} seconds, {stripe['timeout_count']} timeouts")
+    if stats.get('compression') == 'zlib':
+        print(f"Compression: {stats['file_size']} -> {stats['compressed_bytes']} bytes "
+              f"(ratio {stats['compression_ratio']:.3f}), {stats['compress_cpu_time']:.2f} s CPU")
+    if stats.get('delta'):
+        print(f"Delta: {stats['delta_copied_bytes']} of {stats['file_size']} bytes matched the server's copy; "
+              f"sent {stats['delta_wire_bytes']} bytes of ops ({stats['delta_signature_bytes']} bytes of signatures "
+              f"fetched in {stats['delta_signature_time']:.3f} seconds, {stats['delta_cpu_time']:.2f} s CPU matching)")
+    if stats.get('batch'):
+        print(f"Batch: {stats['batch_files']} files, {stats['batch_bytes']} bytes "
+              f"({stats['batch_stream_bytes'] - stats['batch_bytes']} bytes of names and sizes)")
+    print(f"Timeouts: {stats['timeout_count']} ({stats['timeout_retransmissions']} segments resent)")
+    print(f"Fast retransmits: {stats['fast_retransmit_count']} ({stats['fast_retransmissions']} segments resent)")
+    if stats['fec_group_size']:
+        print(f"FEC: {stats['fec_parity_segments']} parity segments ({stats['fec_overhead']:.1%} overhead), "
+              f"{stats['fec_segments_rebuilt']} lost segments rebuilt by the server")
+    if stats['sack']:
+        print(f"SACK: {stats['sacked_segments']} segments SACKed ahead of the cumulative ACK (not resent)")
+    print(f"Final RTO: {stats['final_rto']:.3f} seconds")
+    print(f"Send path: {stats['send_backend']}, {stats['datagrams_sent']} datagrams in {stats['send_syscalls']} syscalls")
     print(f"Stats saved to {stats_file}")
 
 if __name__ == "__main__":
@@ -1,127 +1,780 @@
 #!/usr/bin/env python3
 import sys
-import socket
 import struct
 import random
 import signal
 import time
+import argparse
+import asyncio
+import os
+import bisect
 
-def compute_checksum(data):
-    """Compute 16-bit checksum similar to UDP checksum"""
-    if len(data) % 2 == 1:
-        data += b'\x00'
-    
-    checksum = 0
-    for i in range(0, len(data), 2):
-        word = (data[i] << 8) + data[i + 1]
-        checksum += word
-        checksum = (checksum & 0xFFFF) + (checksum >> 16)
-    
-    return ~checksum & 0xFFFF
+from checksum import compute_checksum
+from ftp_protocol import (HEADER, SEQ_MASK, ACK_PACKET_TYPE, SYN, SYN_PACKET_TYPE, SYN_RESUME, SYN_COMPRESS, SYN_DELTA, SYN_SACK, SYN_BATCH, FIN,
+                          FIN_PACKET_TYPE, RESUME, RESUME_PACKET_TYPE, PROBE_PACKET_TYPE, FEC_PACKET_TYPE,
+                          SIGNATURES_PACKET_TYPE, SACK_BLOCK, SACK_CHECKSUM, MAX_SACK_BLOCKS, PROTOCOLS, UNKNOWN_SIZE,
+                          prefix_digest, unwrap_seq)
+from receiver_storage import (ReceiverStorage, WRITE_MODES, FSYNC_POLICIES, prepare_output, read_checkpoint,
+                              write_checkpoint, remove_checkpoint)
+from compression import DecompressingStorage
+from delta import (DeltaStorage, SignatureCache, SIGNATURES, BLOCK, basis_path, set_aside, restore_basis,
+                   remove_basis)
+from fec import ParityGroup, PARITY, REPORT
+from batch import BatchStorage
+import event_trace
+
+# Sequence number and SACK block count, patched into a session's preencoded ACK
+ACK_FIELDS = struct.Struct('!IH')
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Go-back-N / Selective Repeat reliable file transfer server over UDP",
+        usage="python3 Simple_ftp_server.py <port#> <file-name> <p> [options]")
+    parser.add_argument('port', type=int)
+    parser.add_argument('filename',
+                        help="output file; may contain {session}, {host} and {port} placeholders. Without them, "
+                             "a session that starts while another is active writes to <name>.<session><ext>")
+    parser.add_argument('loss_prob', type=float)
+    parser.add_argument('--protocol', choices=['gbn', 'sr'], default='gbn',
+                        help="gbn = Go-back-N, sr = Selective Repeat, for clients that do not announce "
+                             "their protocol in a SYN")
+    parser.add_argument('--window', type=int, default=1024,
+                        help="Selective Repeat receive window: max out-of-order segments buffered, for clients "
+                             "that do not announce their window in a SYN (default: 1024)")
+    parser.add_argument('--write-mode', choices=WRITE_MODES, default='coalesce',
+                        help="coalesce = buffer in-order data into large writes; pwrite = additionally write "
+                             "Selective Repeat out-of-order segments straight to their file offset")
+    parser.add_argument('--write-buffer', type=int, default=1024 * 1024,
+                        help="coalescing buffer size in bytes (default: 1 MiB)")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default='none',
+                        help="fsync the output on every periodic flush, only on close, or never (default)")
+    parser.add_argument('--idle-timeout', type=float, default=30,
+                        help="close a session after this many seconds without packets, if no FIN closed it "
+                             "first (default: 30)")
+    parser.add_argument('--no-checkpoint', action='store_true',
+                        help="do not keep <output>.ckpt sidecars recording how far each transfer got, "
+                             "which clients use to --resume")
+    parser.add_argument('--ack-every', type=int, default=1, metavar='K',
+                        help="Go-back-N: send one cumulative ACK per K in-order segments (at most half the "
+                             "client's window); gaps and out-of-order segments are still ACKed at once (default: 1)")
+    parser.add_argument('--ack-delay', type=float, default=0.002,
+                        help="longest an in-order segment waits for a coalesced ACK with --ack-every, in seconds "
+                             "(default: 0.002)")
+    parser.add_argument('--batch-threads', type=int, default=4,
+                        help="writer threads per --batch session, which write its files concurrently (default: 4)")
+    parser.add_argument('--once', action='store_true',
+                        help="exit after the first session closes instead of serving until Ctrl+C")
+    parser.add_argument('--trace',
+                        help="write a binary per-segment event trace per session (read it with event_trace.py); "
+                             "may contain {session}, {host} and {port}, otherwise later sessions add .<session>")
+    return parser.parse_args()
+
+class StripedTransfer:
+    """One file arriving as several stripes, each a ReceiverSession writing its byte range"""
+
+    def __init__(self, transfer_id, path, stripe_count, file_size):
+        self.transfer_id = transfer_id
+        self.path = path
+        self.stripe_count = stripe_count
+        self.file_size = file_size
+        self.start_time = time.time()
+        self.stripes_closed = set()
+        prepare_output(path, file_size)
+
+    def stripe_closed(self, session):
+        """Record a finished stripe; True once every stripe has closed"""
+        self.stripes_closed.add(session.stripe_index)
+        if len(self.stripes_closed) < self.stripe_count:
+            return False
+        elapsed = session.last_packet_time - self.start_time
+        print(f"Striped transfer {self.transfer_id:08x} -> {self.path}: {self.stripe_count} stripes, "
+              f"{self.file_size} bytes in {elapsed:.2f} seconds")
+        return True
+
+class ReceiverSession:
+    """Receiver state for one client transfer: sequence numbers, reorder buffer, output file, idle timer"""
+
+    def __init__(self, server, session_id, client_address, path, transfer=None, stripe_index=None, offset=0,
+                 protocol=None, segment_size=None, size=None, window=None, file_size=None, resume=False,
+                 compressed=False, fec_size=0, delta=False, sack=False, batch=False):
+        self.server = server
+        self.session_id = session_id
+        self.client_address = client_address
+        self.path = path
+        self.transfer = transfer  # StripedTransfer this session is one stripe of, if any
+        self.stripe_index = stripe_index
+        args = server.args
+
+        self.selective_repeat = (protocol or args.protocol) == 'sr'
+        self.recv_window = window or args.window
+        self.expected_seq_num = 0  # unbounded; the 32-bit wire seq is compared modulo 2^32
+        # Selective Repeat: out-of-order segments waiting for the gap to fill. In pwrite mode
+        # the value is just the length of a segment already written at its offset.
+        self.reorder_buffer = {}
+        # MSS from the SYN, or learned from segment 0 (only the last segment is shorter)
+        self.segment_size = segment_size
+        # Delta transfers rebuild the file from ops against the old copy, moved aside first
+        self.delta = delta
+        if delta:
+            set_aside(path)
+        # Batch transfers write many files, under path as a directory
+        self.batch = batch
+        if batch:
+            self.output_file = BatchStorage(path, args.batch_threads, args.write_buffer, args.fsync)
+        else:
+            self.output_file = ReceiverStorage(path, args.write_mode, args.write_buffer, args.fsync,
+                                               base_offset=offset, truncate=transfer is None and not resume)
+        self.compressed = compressed
+        if compressed:
+            self.output_file = DecompressingStorage(self.output_file)
+        if delta:
+            self.output_file = DeltaStorage(self.output_file, basis_path(path))
+        if size is not None and transfer is None:
+            self.output_file.preallocate(size)  # striped transfers preallocate the whole file once
+        # Checkpoints of the contiguous prefix on disk, for transfers of a known size that are not striped
+        # (nor delta transfers, whose partial rebuild is discarded for the old copy)
+        self.file_size = file_size
+        self.checkpointing = file_size is not None and transfer is None and not delta and not args.no_checkpoint
+        self.checkpointed = offset
+        if self.checkpointing and not resume:
+            remove_checkpoint(path)  # left over from an earlier transfer to this name
+        # XOR parity groups of fec_size segments (0 = no FEC). Go-back-N keeps out-of-order
+        # segments in reorder_buffer too, so a rebuilt segment can release the ones after it,
+        # and holds back duplicate ACKs while the gap's own parity may still fill it.
+        self.fec_size = fec_size
+        self.fec_groups = {}  # group index -> ParityGroup
+        self.held_dup_acks = 0
+        self.parities_received = 0
+        self.segments_rebuilt = 0
+        # Go-back-N with SACK also keeps out-of-order segments, and every ACK lists the runs of
+        # them (sorted, disjoint [start, end) ranges above expected_seq_num) in SACK blocks
+        self.sack = sack and not self.selective_repeat
+        self.sack_starts = []
+        self.sack_ends = []
+        self.last_buffered = None  # the run holding this segment is reported first
+        # ACKs go out of one preencoded buffer with the sequence number (and SACK blocks) patched
+        # in place. Go-back-N may coalesce in-order ACKs: one per ack_every segments, or after
+        # ack_delay, whichever comes first; anything else is ACKed at once.
+        self.ack_packet = bytearray(HEADER.size + (MAX_SACK_BLOCKS * SACK_BLOCK.size + SACK_CHECKSUM.size
+                                                   if self.sack else 0))
+        HEADER.pack_into(self.ack_packet, 0, 0, 0, ACK_PACKET_TYPE)
+        self.ack_view = memoryview(self.ack_packet)
+        self.ack_every = 1 if self.selective_repeat else max(1, min(args.ack_every, self.recv_window // 2))
+        self.unacked = 0  # in-order segments delivered since the last ACK
+        self.gap = False  # Go-back-N discarded a segment; the one that fills the gap is ACKed at once
+        self.ack_timer = None
+        self.acks_sent = 0
+        self.fin_packet = None  # FIN waiting for the last segments before it is ACKed
+        self.fin_ack = None
+        self.fin_segments = None
+        self.trace = None
+        if args.trace:
+            trace_path = event_trace.numbered_path(args.trace, session_id if session_id > 1 else None, session=session_id,
+                                                   host=client_address[0], port=client_address[1])
+            self.trace = event_trace.EventTrace(trace_path, event_trace.SERVER)
+
+        self.start_time = time.time()
+        self.last_packet_time = self.start_time
+        self.packets_received = 0
+        self.packets_dropped = 0
+        self.closed = False
+
+        # Flush periodically to avoid data loss, and check for idleness
+        self.timer = server.loop.call_later(1.0, self.tick)
+
+    def send_ack(self, seq_num):
+        packet = self.ack_packet
+        length = HEADER.size
+        if self.sack:
+            for start, end in self.sack_blocks():
+                SACK_BLOCK.pack_into(packet, length, start & SEQ_MASK, end & SEQ_MASK)
+                length += SACK_BLOCK.size
+        # 32-bit seq number, 16-bit all zeros or the number of SACK blocks (the type is already in place)
+        ACK_FIELDS.pack_into(packet, 0, seq_num, (length - HEADER.size) // SACK_BLOCK.size)
+        if length > HEADER.size:
+            SACK_CHECKSUM.pack_into(packet, length, compute_checksum(self.ack_view[HEADER.size:length]))
+            length += SACK_CHECKSUM.size
+
+        self.server.transport.sendto(self.ack_view[:length], self.client_address)
+        self.acks_sent += 1
+        # Every ACK is cumulative, so it also covers in-order segments waiting for a delayed one
+        self.unacked = 0
+        if self.ack_timer is not None:
+            self.ack_timer.cancel()
+            self.ack_timer = None
+
+    def ack_in_order(self):
+        """ACK the in-order prefix now, or once ack_every segments are waiting or ack_delay has passed"""
+        self.unacked += 1
+        if self.unacked >= self.ack_every:
+            self.send_ack((self.expected_seq_num - 1) & SEQ_MASK)
+        elif self.ack_timer is None:
+            self.ack_timer = self.server.loop.call_later(self.server.args.ack_delay, self.delayed_ack)
+
+    def delayed_ack(self):
+        self.ack_timer = None
+        if self.unacked and not self.closed:
+            self.send_ack((self.expected_seq_num - 1) & SEQ_MASK)
+
+    def handle_segment(self, seq_num, recv_checksum, data):
+        # Update timer (even if we drop it - client is still active)
+        self.last_packet_time = time.time()
+        self.packets_received += 1
+
+        # Probabilistic loss service
+        r = random.random()
+        if r <= self.server.loss_prob:
+            print(f"Packet loss, sequence number = {seq_num}")
+            self.packets_dropped += 1
+            if self.trace:
+                self.trace.record(event_trace.DROP, seq_num, len(data))
+            return
+
+        # Compute checksum of data
+        computed_checksum = compute_checksum(data)
+
+        if computed_checksum != recv_checksum:
+            if self.trace:
+                self.trace.record(event_trace.DISCARD, seq_num, len(data), event_trace.CAUSE_CHECKSUM)
+            return
+
+        if self.selective_repeat:
+            self.accept_selective(seq_num, data)
+            return
+        if self.fec_size or self.sack:
+            self.accept_buffered(seq_num, data)
+            return
+
+        # Check if packet is in-sequence (the checksum is correct)
+        if seq_num == self.expected_seq_num & SEQ_MASK:
+            # Write data to file
+            self.output_file.append(data)
+            if self.trace:
+                self.trace.record(event_trace.ACCEPT, seq_num, len(data))
+
+            # Send ACK (or let it wait for the next ones, see ack_in_order)
+            self.expected_seq_num += 1
+            if self.gap:
+                self.gap = False
+                self.send_ack(seq_num)
+            else:
+                self.ack_in_order()
+            if self.fin_packet is not None:
+                self.check_complete()
+        else:
+            # Out-of-sequence: Go-back-N discards it, but re-ACKs the last in-order
+            # segment so the client can fast retransmit (0xFFFFFFFF before segment 0)
+            if self.trace:
+                self.trace.record(event_trace.DISCARD, seq_num, len(data), event_trace.CAUSE_OUT_OF_ORDER)
+            self.gap = True
+            self.send_ack((self.expected_seq_num - 1) & SEQ_MASK)
+
+    def accept_buffered(self, seq_num, data, cause=event_trace.CAUSE_NONE):
+        """Go-back-N with FEC or SACK: keep out-of-order segments within the window, still ACK cumulatively"""
+        offset = (seq_num - self.expected_seq_num) & SEQ_MASK
+        if offset >= self.recv_window:
+            if self.trace:
+                self.trace.record(event_trace.DISCARD, seq_num, len(data), event_trace.CAUSE_OUT_OF_ORDER)
+            self.send_ack((self.expected_seq_num - 1) & SEQ_MASK)
+            return
+        abs_seq = self.expected_seq_num + offset
+        if abs_seq in self.reorder_buffer:
+            if self.trace:
+                self.trace.record(event_trace.DISCARD, seq_num, len(data), event_trace.CAUSE_DUPLICATE)
+        else:
+            if self.trace:
+                self.trace.record(event_trace.ACCEPT, seq_num, len(data), cause)
+            self.reorder_buffer[abs_seq] = data
+            if self.fec_size:
+                self.fec_add(abs_seq, data)
+            if self.sack and offset:
+                self.sack_add(abs_seq)
+
+        if offset == 0:
+            delivered_from = self.expected_seq_num
+            while self.expected_seq_num in self.reorder_buffer:
+                self.output_file.append(self.reorder_buffer.pop(self.expected_seq_num))
+                self.expected_seq_num += 1
+                if self.fec_size and self.expected_seq_num % self.fec_size == 0:
+                    self.fec_groups.pop(self.expected_seq_num // self.fec_size - 1, None)
+            if self.sack:
+                while self.sack_ends and self.sack_ends[0] <= self.expected_seq_num:
+                    del self.sack_starts[0], self.sack_ends[0]
+            self.held_dup_acks = 0
+            if self.expected_seq_num - delivered_from > 1 or self.reorder_buffer:
+                self.send_ack((self.expected_seq_num - 1) & SEQ_MASK)  # a gap was filled, or one remains
+            else:
+                self.ack_in_order()
+            if self.fin_packet is not None:
+                self.check_complete()
+        elif self.fec_size:
+            gap_group = self.expected_seq_num // self.fec_size
+            gap = self.fec_groups.get(gap_group)
+            if abs_seq // self.fec_size == gap_group and (gap is None or gap.parity is None):
+                self.held_dup_acks += 1
+            else:
+                self.release_dup_acks()
+                self.send_ack((self.expected_seq_num - 1) & SEQ_MASK)
+        else:
+            self.send_ack((self.expected_seq_num - 1) & SEQ_MASK)
+        if self.fec_size:
+            self.fec_check(abs_seq // self.fec_size)
+
+    def sack_add(self, seq):
+        """Add a segment buffered above expected_seq_num to the SACK ranges"""
+        starts, ends = self.sack_starts, self.sack_ends
+        i = bisect.bisect_right(starts, seq)
+        if i and ends[i - 1] == seq:
+            ends[i - 1] = seq + 1
+            if i < len(starts) and starts[i] == seq + 1:
+                ends[i - 1] = ends[i]
+                del starts[i], ends[i]
+        elif i < len(starts) and starts[i] == seq + 1:
+            starts[i] = seq
+        else:
+            starts.insert(i, seq)
+            ends.insert(i, seq + 1)
+        self.last_buffered = seq
+
+    def sack_blocks(self):
+        """Up to MAX_SACK_BLOCKS (start, end) ranges: the one just added to first, then the highest"""
+        starts, ends = self.sack_starts, self.sack_ends
+        if not starts:
+            return ()
+        latest = bisect.bisect_right(starts, self.last_buffered) - 1
+        if latest < 0 or ends[latest] <= self.last_buffered:
+            latest = len(starts) - 1
+        blocks = [(starts[latest], ends[latest])]
+        for i in range(len(starts) - 1, -1, -1):
+            if len(blocks) == MAX_SACK_BLOCKS:
+                break
+            if i != latest:
+                blocks.append((starts[i], ends[i]))
+        return blocks
+
+    def release_dup_acks(self):
+        """Send the duplicate ACKs held back for a gap that parity has not filled"""
+        for _ in range(self.held_dup_acks):
+            self.send_ack((self.expected_seq_num - 1) & SEQ_MASK)
+        self.held_dup_acks = 0
+
+    def fec_add(self, abs_seq, data):
+        group = self.fec_groups.get(abs_seq // self.fec_size)
+        if group is None:
+            group = self.fec_groups[abs_seq // self.fec_size] = ParityGroup(abs_seq - abs_seq % self.fec_size)
+        group.add_segment(abs_seq, data)
+
+    def fec_check(self, group_index):
+        """Rebuild and accept the one missing segment of a group if its parity allows; True if it did"""
+        group = self.fec_groups.get(group_index)
+        rebuilt = group.rebuild() if group and not self.closed else None
+        if rebuilt is None:
+            return False
+        seq, data = rebuilt
+        self.segments_rebuilt += 1
+        if self.selective_repeat:
+            self.accept_selective(seq & SEQ_MASK, data, event_trace.CAUSE_FEC)
+        else:
+            self.accept_buffered(seq & SEQ_MASK, data, event_trace.CAUSE_FEC)
+        return True
+
+    def parity_received(self, seq_num, recv_checksum, payload):
+        self.last_packet_time = time.time()
+        if (not self.fec_size or len(payload) < PARITY.size
+                or compute_checksum(payload) != recv_checksum):
+            return
+        if random.random() <= self.server.loss_prob:
+            print(f"Packet loss, parity for sequence number = {seq_num}")
+            self.packets_dropped += 1
+            return
+
+        # The group's first segment may already be delivered, so map the wire seq either side of expected
+        first = unwrap_seq(seq_num, self.expected_seq_num)
+        count, _ = PARITY.unpack_from(payload)
+        if first < 0 or first % self.fec_size or first + count <= self.expected_seq_num:
+            return
+        self.parities_received += 1
+        group_index = first // self.fec_size
+        group = self.fec_groups.get(group_index)
+        if group is None:
+            group = self.fec_groups[group_index] = ParityGroup(first)
+        group.set_parity(payload)
+        if not self.fec_check(group_index) and not self.selective_repeat:
+            if group_index == self.expected_seq_num // self.fec_size:
+                self.release_dup_acks()  # too many losses in the group: let the client fast retransmit
+
+    def accept_selective(self, seq_num, data, cause=event_trace.CAUSE_NONE):
+        """Selective Repeat receive: buffer within the window, ACK individually, deliver in order"""
+        offset = (seq_num - self.expected_seq_num) & SEQ_MASK
+        if offset < self.recv_window:
+            abs_seq = self.expected_seq_num + offset
+            if self.trace:
+                duplicate = abs_seq in self.reorder_buffer
+                self.trace.record(event_trace.DISCARD if duplicate else event_trace.ACCEPT, seq_num, len(data),
+                                  event_trace.CAUSE_DUPLICATE if duplicate else cause)
+            if abs_seq not in self.reorder_buffer:
+                if self.fec_size:
+                    self.fec_add(abs_seq, data)
+                if offset and self.output_file.mode == 'pwrite' and self.segment_size:
+                    self.output_file.write_at(abs_seq * self.segment_size, data)
+                    self.reorder_buffer[abs_seq] = len(data)
+                else:
+                    self.reorder_buffer[abs_seq] = data
+            self.send_ack(seq_num)
+
+            # Deliver the in-order prefix
+            while self.expected_seq_num in self.reorder_buffer:
+                segment = self.reorder_buffer.pop(self.expected_seq_num)
+                if isinstance(segment, int):
+                    self.output_file.skip(segment)
+                else:
+                    self.output_file.append(segment)
+                    if self.expected_seq_num == 0 and self.segment_size is None:
+                        self.segment_size = len(segment)
+                self.expected_seq_num += 1
+                if self.fec_size and self.expected_seq_num % self.fec_size == 0:
+                    self.fec_groups.pop(self.expected_seq_num // self.fec_size - 1, None)
+            if self.fin_packet is not None:
+                self.check_complete()
+            if self.fec_size:
+                self.fec_check(abs_seq // self.fec_size)
+        elif (self.expected_seq_num - seq_num) & SEQ_MASK <= self.recv_window:
+            # Already delivered - our ACK was lost, so ACK it again
+            if self.trace:
+                self.trace.record(event_trace.DISCARD, seq_num, len(data), event_trace.CAUSE_DUPLICATE)
+            self.send_ack(seq_num)
+        elif self.trace:
+            self.trace.record(event_trace.DISCARD, seq_num, len(data), event_trace.CAUSE_OUTSIDE_WINDOW)
+
+    def fin_received(self, packet, total_segments):
+        """FIN: close as soon as every segment has been delivered"""
+        self.last_packet_time = time.time()
+        self.fin_packet = packet
+        self.fin_segments = total_segments
+        self.check_complete()
+
+    def check_complete(self):
+        if self.expected_seq_num >= self.fin_segments:
+            # Echo the FIN as the FIN-ACK, then flush and report right away
+            self.fin_ack = self.fin_packet + (REPORT.pack(self.segments_rebuilt) if self.fec_size else b'')
+            self.server.transport.sendto(self.fin_ack, self.client_address)
+            self.server.close_session(self, self.fin_packet)
+
+    def write_checkpoint(self):
+        position = self.output_file.position
+        write_checkpoint(self.path, file_size=self.file_size, mss=self.segment_size,
+                         bytes=position, segments=position // self.segment_size)
+        self.checkpointed = position
+
+    def tick(self):
+        self.output_file.flush()
+        if self.checkpointing and self.output_file.position != self.checkpointed:
+            self.write_checkpoint()
+        idle_timeout = self.server.args.idle_timeout
+        if time.time() - self.last_packet_time > idle_timeout:
+            print(f"\nNo data received for {idle_timeout:g} seconds; closing the session.")
+            self.server.close_session(self)
+        else:
+            self.timer = self.server.loop.call_later(1.0, self.tick)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.timer.cancel()
+        if self.ack_timer is not None:
+            self.ack_timer.cancel()
+        self.output_file.close()
+        if self.delta:
+            if self.fin_packet is not None and not self.output_file.unchanged:
+                remove_basis(self.path)
+            else:
+                # Keep the old copy rather than a partial rebuild, or rather than an identical
+                # rewrite, so its mtime (and cached signatures) stay valid
+                restore_basis(self.path)
+        if self.checkpointing:
+            if self.fin_packet is not None:
+                remove_checkpoint(self.path)  # complete
+            elif self.output_file.position != self.checkpointed:
+                self.write_checkpoint()
+        if self.trace:
+            self.trace.close()
+        storage_stats = self.output_file.stats()
+        stripe = f" (stripe {self.stripe_index})" if self.transfer else ""
+        elapsed = self.last_packet_time - self.start_time
+        print(f"Session {self.session_id} from {self.client_address[0]}:{self.client_address[1]} -> {self.path}{stripe}: "
+              f"{self.expected_seq_num} segments in {elapsed:.2f} seconds, {self.packets_dropped} dropped"
+              + ("" if self.fin_packet is not None else " (closed by idle timeout)"))
+        print(f"Write syscalls: {storage_stats['write_syscalls']} "
+              f"({storage_stats['bytes_per_syscall']:.0f} bytes/syscall), fsyncs: {storage_stats['fsync_count']}")
+        print(f"ACKs sent: {self.acks_sent}" + (f" (one per {self.ack_every} in-order segments or "
+                                                f"{self.server.args.ack_delay * 1000:g} ms)" if self.ack_every > 1 else ""))
+        if self.fec_size:
+            print(f"FEC: {self.parities_received} parity segments received, {self.segments_rebuilt} segments rebuilt "
+                  f"(groups of {self.fec_size})")
+        if self.compressed:
+            print(f"Decompressed {storage_stats['compressed_bytes']} bytes "
+                  f"(ratio {storage_stats['compression_ratio']:.3f}) in {storage_stats['decompress_cpu_time']:.2f} s CPU")
+        if self.batch:
+            print(f"Batch: {storage_stats['batch_files']} files ({storage_stats['batch_bytes']} bytes) written under "
+                  f"{self.path} by {storage_stats['batch_threads']} threads in {storage_stats['batch_write_time']:.2f} "
+                  f"thread-seconds" + (f", {storage_stats['batch_skipped']} skipped" if storage_stats['batch_skipped'] else "")
+                  + (f", {storage_stats['batch_failed']} failed" if storage_stats['batch_failed'] else ""))
+        if self.delta:
+            print(f"Delta: {storage_stats['delta_copied_bytes']} bytes copied from the old copy, "
+                  f"{storage_stats['delta_literal_bytes']} new bytes received "
+                  f"({storage_stats['delta_wire_bytes']} bytes of ops)")
+
+class ReceiverProtocol(asyncio.DatagramProtocol):
+    """Demultiplexes datagrams by client address into independent ReceiverSessions"""
+
+    def __init__(self, args, loop, done):
+        self.args = args
+        self.loss_prob = args.loss_prob
+        self.loop = loop
+        self.done = done
+        self.transport = None
+        self.sessions = {}
+        self.session_count = 0
+        self.transfers = {}  # transfer id -> StripedTransfer
+        self.finished = {}  # client address -> (FIN, FIN-ACK) of its closed session, for re-sending lost FIN-ACKs
+        self.signatures = SignatureCache(loop)
+        self.digests = {}  # (path, offset) -> future of a RESUME prefix digest being computed
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def output_path(self, session_id, client_address):
+        filename = self.args.filename
+        if '{' in filename:
+            return filename.format(session=session_id, host=client_address[0], port=client_address[1])
+        active = {session.path for session in self.sessions.values()}
+        if filename not in active:
+            return filename
+        stem, ext = os.path.splitext(filename)
+        return f"{stem}.{session_id}{ext}"
+
+    def datagram_received(self, packet, client_address):
+        # Parse header (32-bit seq, 16-bit checksum, 16-bit type)
+        if len(packet) < 8:
+            return
+
+        seq_num, recv_checksum, packet_type = struct.unpack_from('!IHH', packet)
+
+        if packet_type == SYN_PACKET_TYPE:
+            self.syn_received(packet, recv_checksum, client_address)
+            return
+        if packet_type == FIN_PACKET_TYPE:
+            self.fin_received(packet, recv_checksum, client_address)
+            return
+        if packet_type == RESUME_PACKET_TYPE:
+            self.resume_received(packet, recv_checksum, client_address)
+            return
+        if packet_type == SIGNATURES_PACKET_TYPE:
+            self.signatures_received(packet, recv_checksum, client_address)
+            return
+        if packet_type == FEC_PACKET_TYPE:
+            session = self.sessions.get(client_address)
+            if session is not None:
+                session.parity_received(seq_num, recv_checksum, packet[HEADER.size:])
+            return
+        if packet_type == PROBE_PACKET_TYPE:
+            # Path MTU probe: echo the header if the whole datagram arrived
+            if len(packet) - HEADER.size == seq_num and random.random() > self.loss_prob:
+                self.transport.sendto(packet[:HEADER.size], client_address)
+            return
+
+        # Check if this is a data packet
+        if packet_type != 0b0101010101010101:
+            return
+
+        session = self.sessions.get(client_address)
+        if session is None:
+            # Late duplicates for a session closed by its FIN are dropped. Anything else has no
+            # session to go to (only a SYN opens one, so a partial output is never truncated):
+            # tell the client to give up rather than let it retransmit forever.
+            if self.finished.get(client_address, (None,))[0] is None:
+                self.transport.sendto(HEADER.pack(0, 0, FIN_PACKET_TYPE), client_address)
+            return
+
+        session.handle_segment(seq_num, recv_checksum, packet[8:])
+
+    def open_session(self, client_address, transfer=None, stripe_index=None, offset=0, **syn):
+        self.session_count += 1
+        path = transfer.path if transfer else self.output_path(self.session_count, client_address)
+        session = ReceiverSession(self, self.session_count, client_address, path, transfer, stripe_index, offset, **syn)
+        self.sessions[client_address] = session
+        print(f"Session {session.session_id} started from {client_address[0]}:{client_address[1]}, "
+              f"saving to {path}" + (f" (stripe {stripe_index} at offset {offset})" if transfer else ""))
+        return session
+
+    def syn_received(self, packet, recv_checksum, client_address):
+        """A SYN: open the session (or stripe) it describes, then echo the packet as the SYN-ACK"""
+        descriptor = packet[8:8 + SYN.size]
+        if len(descriptor) != SYN.size or compute_checksum(descriptor) != recv_checksum:
+            return
+        if random.random() <= self.loss_prob:
+            return  # the loss service applies to control packets too
+
+        if client_address not in self.sessions and client_address not in self.finished:
+            (transfer_id, stripe_index, stripe_count, offset, length, file_size,
+             mss, window, protocol, flags, fec_size) = SYN.unpack(descriptor)
+            if protocol >= len(PROTOCOLS):
+                return
+            transfer = None
+            if stripe_count > 1:
+                transfer = self.transfers.get(transfer_id)
+                if transfer is None:
+                    path = self.output_path(self.session_count + 1, client_address)
+                    transfer = StripedTransfer(transfer_id, path, stripe_count, file_size)
+                    self.transfers[transfer_id] = transfer
+            resume = bool(flags & SYN_RESUME) and transfer is None
+            if resume:
+                print(f"Resuming {self.output_path(self.session_count + 1, client_address)} at byte {offset}")
+            file_size = None if file_size == UNKNOWN_SIZE else file_size
+            batch = bool(flags & SYN_BATCH) and transfer is None
+            self.open_session(client_address, transfer, stripe_index if transfer else None, offset,
+                              protocol=PROTOCOLS[protocol], segment_size=mss, window=window, size=file_size,
+                              file_size=file_size, resume=resume, compressed=bool(flags & SYN_COMPRESS),
+                              fec_size=fec_size, delta=bool(flags & SYN_DELTA) and transfer is None and not batch,
+                              sack=bool(flags & SYN_SACK), batch=batch)
+        self.transport.sendto(packet, client_address)
+
+    def resume_received(self, packet, recv_checksum, client_address):
+        """A RESUME request: answer with the checkpointed offset of the output file and a digest of the bytes before it"""
+        descriptor = packet[8:8 + RESUME.size]
+        if len(descriptor) != RESUME.size or compute_checksum(descriptor) != recv_checksum:
+            return
+        if random.random() <= self.loss_prob:
+            return
+
+        file_size, mss, _, _ = RESUME.unpack(descriptor)
+        path = self.output_path(self.session_count + 1, client_address)
+        offset = 0
+        checkpoint = None if self.args.no_checkpoint else read_checkpoint(path)
+        if (checkpoint and checkpoint.get('file_size') == file_size and checkpoint.get('mss') == mss
+                and os.path.exists(path) and os.path.getsize(path) >= checkpoint.get('bytes', 0)):
+            offset = checkpoint['bytes']
+        if not offset:
+            self.send_resume_answer(client_address, file_size, mss, 0, bytes(32))
+            return
+
+        # Hashing a large partial file would stall every other session, so it runs in a thread;
+        # a retransmitted request for the same prefix waits for the same digest
+        key = (path, offset)
+        digest = self.digests.get(key)
+        if digest is None:
+            digest = self.digests[key] = self.loop.run_in_executor(None, prefix_digest, path, offset)
+            digest.add_done_callback(lambda done: self.digests.pop(key, None))
+
+        def answer(done):
+            if done.cancelled() or done.exception() is not None:
+                self.send_resume_answer(client_address, file_size, mss, 0, bytes(32))  # start over
+            else:
+                self.send_resume_answer(client_address, file_size, mss, offset, done.result())
+        digest.add_done_callback(answer)
+
+    def send_resume_answer(self, client_address, file_size, mss, offset, digest):
+        answer = RESUME.pack(file_size, mss, offset, digest)
+        self.transport.sendto(HEADER.pack(0, compute_checksum(answer), RESUME_PACKET_TYPE) + answer, client_address)
+
+    def signatures_received(self, packet, recv_checksum, client_address):
+        """A SIGNATURES request: answer with a page of block signatures of the output file (see delta.py)"""
+        descriptor = packet[8:8 + SIGNATURES.size]
+        if len(descriptor) != SIGNATURES.size or compute_checksum(descriptor) != recv_checksum:
+            return
+        if random.random() <= self.loss_prob:
+            return
+
+        _, _, _, first, count = SIGNATURES.unpack(descriptor)
+        path = self.output_path(self.session_count + 1, client_address)
+        entry = self.signatures.get(path)
+        if entry is None:
+            return  # being signed on a worker thread; the client asks again
+        size, mtime, block_size, signatures = entry
+        # Signatures of the copy as it is now; the client notices from size and mtime if that changed
+        count = max(0, min(count, len(signatures) // BLOCK.size - first))
+        answer = (SIGNATURES.pack(size, mtime, block_size, first, count)
+                  + signatures[first * BLOCK.size:(first + count) * BLOCK.size])
+        self.transport.sendto(HEADER.pack(0, compute_checksum(answer), SIGNATURES_PACKET_TYPE) + answer, client_address)
+
+    def fin_received(self, packet, recv_checksum, client_address):
+        descriptor = packet[8:8 + FIN.size]
+        if len(descriptor) != FIN.size or compute_checksum(descriptor) != recv_checksum:
+            return
+        if random.random() <= self.loss_prob:
+            return
+
+        session = self.sessions.get(client_address)
+        if session is not None:
+            total_segments, _ = FIN.unpack(descriptor)
+            session.fin_received(packet, total_segments)
+        elif client_address in self.finished and self.finished[client_address][0] == packet:
+            self.transport.sendto(self.finished[client_address][1], client_address)  # our FIN-ACK was lost
+
+    def error_received(self, exc):
+        # e.g. ICMP port unreachable after a client exits - not fatal for other sessions
+        pass
+
+    def close_session(self, session, fin_packet=None):
+        session.close()
+        if self.sessions.get(session.client_address) is session:
+            del self.sessions[session.client_address]
+        # Remember the FIN for a while to re-ACK it and ignore late duplicates; a session
+        # closed for being idle is remembered as (None, None), and its client is reset
+        address = session.client_address
+        self.finished[address] = (fin_packet, session.fin_ack)
+        self.loop.call_later(self.args.idle_timeout, self.finished.pop, address, None)
+        transfer_done = True
+        if session.transfer is not None:
+            transfer_done = session.transfer.stripe_closed(session)
+            if transfer_done:
+                del self.transfers[session.transfer.transfer_id]
+        if self.args.once and transfer_done and not self.done.done():
+            self.done.set_result(None)
+
+    def close_all(self):
+        for session in list(self.sessions.values()):
+            session.close()
+        self.sessions.clear()
+
+async def serve(args):
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: ReceiverProtocol(args, loop, done), local_addr=('0.0.0.0', args.port))
 
-def main():
-    if len(sys.argv) != 4:
-        print("Usage: python3 Simple_ftp_server.py <port#> <file-name> <p>")
-        sys.exit(1)
-    
-    port = int(sys.argv[1])
-    filename = sys.argv[2]
-    loss_prob = float(sys.argv[3])
-    
-    # Create UDP socket
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    server_socket.bind(('', port))
-    server_socket.settimeout(1.0)  # 1 second timeout to allow signal handling
-    
-    print(f"Server listening on port {port}...")
-    print(f"Saving to file: {filename}")
-    print(f"Packet loss probability: {loss_prob}")
-    print("Press Ctrl+C to stop\n")
-    
-    expected_seq_num = 0
-    output_file = None
-    last_packet_time = time.time()
-    received_any_packet = False  # Track if we've received at least one packet
-    idle_timeout = 30  # Exit after 30 seconds of no packets (generous for retransmissions)
-    
     # Setup signal handler for graceful shutdown
-    def signal_handler(sig, frame):
+    def signal_handler():
         print("\n\nShutting down server gracefully...")
-        if output_file:
-            output_file.close()
-        server_socket.close()
-        sys.exit(130)  # Standard exit code for SIGINT (Ctrl+C)
-    
-    signal.signal(signal.SIGINT, signal_handler)
-    
+        if not done.done():
+            done.set_exception(KeyboardInterrupt())
+
+    loop.add_signal_handler(signal.SIGINT, signal_handler)
+
     try:
-        output_file = open(filename, 'wb')
-        
-        while True:
-            try:
-                # Receive packet
-                packet, client_address = server_socket.recvfrom(65535)
-            except socket.timeout:
-                # Timeout is normal, just continue waiting
-                # Flush the file periodically to avoid data loss
-                output_file.flush()
-                
-                # Only check idle timeout if we've received at least one packet
-                if received_any_packet and (time.time() - last_packet_time > idle_timeout):
-                    print(f"\nNo data received for {idle_timeout} seconds. Transfer complete.")
-                    break
-                
-                continue
-            
-            # Parse header (32-bit seq, 16-bit checksum, 16-bit type)
-            if len(packet) < 8:
-                continue
-            
-            seq_num = struct.unpack('!I', packet[0:4])[0]
-            recv_checksum = struct.unpack('!H', packet[4:6])[0]
-            packet_type = struct.unpack('!H', packet[6:8])[0]
-            data = packet[8:]
-            
-            # Check if this is a data packet
-            if packet_type != 0b0101010101010101:
-                continue
-            
-            # Mark that we've received at least one data packet
-            # and update timer (even if we drop it - client is still active)
-            received_any_packet = True
-            last_packet_time = time.time()
-            
-            # Probabilistic loss service
-            r = random.random()
-            if r <= loss_prob:
-                print(f"Packet loss, sequence number = {seq_num}")
-                continue
-            
-            # Compute checksum of data
-            computed_checksum = compute_checksum(data)
-            
-            # Check if packet is in-sequence and checksum is correct
-            if seq_num == expected_seq_num and computed_checksum == recv_checksum:
-                # Write data to file
-                output_file.write(data)
-                
-                # Send ACK
-                ack_packet = struct.pack('!I', seq_num)  # 32-bit seq number
-                ack_packet += struct.pack('!H', 0)  # 16-bit all zeros
-                ack_packet += struct.pack('!H', 0b1010101010101010)  # 16-bit ACK type
-                
-                server_socket.sendto(ack_packet, client_address)
-                
-                expected_seq_num += 1
-            # If out-of-sequence or checksum incorrect, do nothing (Go-back-N discards)
-            
-    except Exception as e:
-        print(f"\nError: {e}")
+        await done
     finally:
-        if output_file:
-            output_file.close()
-        server_socket.close()
+        protocol.close_all()
+        transport.close()
         print("Server closed.")
 
+def main():
+    args = parse_args()
+
+    print(f"Server listening on port {args.port}...")
+    print(f"Saving to file: {args.filename}")
+    print(f"Packet loss probability: {args.loss_prob}")
+    print(f"Protocol: {'Selective Repeat' if args.protocol == 'sr' else 'Go-back-N'} (unless a client's SYN says otherwise)")
+    print("Press Ctrl+C to stop\n")
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        sys.exit(130)  # Standard exit code for SIGINT (Ctrl+C)
+    except Exception as e:
+        print(f"\nError: {e}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
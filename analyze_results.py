@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Analyze Transfer Statistics and Generate Results
+
+Usage: python analyze_results.py --task {1,2,3}
+       python analyze_results.py [stats.jsonl ...] --group-by KEY [KEY ...] [--metric KEY ...]
+                                 [--where KEY=VALUE ...] [--percentiles P ...]
+                                 [--table results.txt] [--plot plot.png]
+
+Streams one or more JSONL stats files (transfer_stats.jsonl, the task*_stats.jsonl
+files or benchmark_sweep.py output; '-' = stdin) record by record and groups them
+by any field or combination of fields. Each group keeps running aggregates:
+count, mean and standard deviation (Welford), min/max, and the values
+themselves in a compact array for exact percentiles, so hundreds of thousands
+of records need no per-record dicts in memory.
+
+--task 1/2/3 reproduces the original experiment reports (taskN_results.txt
+and taskN_plot.png, grouped by N, MSS and p). matplotlib is imported only
+when a plot is written.
+"""
+
+import argparse
+import json
+import math
+import sys
+from array import array
+
+# Fields recorded under different names by older runs
+FIELD_ALIASES = {
+    'loss_prob': ('loss_prob', 'server_probability'),
+}
+
+TASKS = {
+    '1': {
+        'stats': 'task1_stats.jsonl',
+        'group_by': ['window_size'],
+        'title': 'Task 1 Results: Effect of Window Size N on Transfer Delay',
+        'label': 'Window Size (N)',
+        'width': 15,
+        'context': [('MSS', 'mss', '{} bytes'), ('Loss probability', None, '0.05')],
+        'xlabel': 'Window Size N',
+        'plot_title': 'Task 1: Effect of Window Size N on Transfer Delay\n(MSS=500 bytes, p=0.05)',
+        'log2': True,
+        'expected': [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024],
+    },
+    '2': {
+        'stats': 'task2_stats.jsonl',
+        'group_by': ['mss'],
+        'title': 'Task 2 Results: Effect of MSS on Transfer Delay',
+        'label': 'MSS (bytes)',
+        'width': 15,
+        'context': [('Window Size N', 'window_size', '{}'), ('Loss probability', None, '0.05')],
+        'xlabel': 'Maximum Segment Size (MSS) [bytes]',
+        'plot_title': 'Task 2: Effect of MSS on Transfer Delay\n(N=64, p=0.05)',
+        'extra_metrics': ['total_segments', 'timeout_count'],
+        'expected': list(range(100, 1001, 100)),
+    },
+    '3': {
+        'stats': 'task3_stats.jsonl',
+        'group_by': ['loss_prob'],
+        'title': 'Task 3 Results: Effect of Loss Probability on Transfer Delay',
+        'label': 'Probability (p)',
+        'width': 17,
+        'key_format': '{:.2f}',
+        'context': [('MSS', 'mss', '{} bytes'), ('Window size (N)', 'window_size', '{}')],
+        'xlabel': 'Loss Probability (p)',
+        'plot_title': 'Task 3: Effect of Loss Probability on Transfer Delay\n(N=64, MSS=500 bytes)',
+        'expected': [round(p * 0.01, 2) for p in range(1, 11)],
+    },
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Group transfer statistics and report aggregates, tables and plots")
+    parser.add_argument('files', nargs='*', help="JSONL stats files ('-' = stdin; default: transfer_stats.jsonl)")
+    parser.add_argument('--task', choices=sorted(TASKS), help="reproduce the report of experiment 1, 2 or 3")
+    parser.add_argument('--group-by', nargs='+', help="fields to group by, e.g. protocol window_size")
+    parser.add_argument('--metric', nargs='+', default=['elapsed_time'],
+                        help="numeric fields to aggregate (default: elapsed_time)")
+    parser.add_argument('--where', nargs='+', default=[], metavar='KEY=VALUE',
+                        help="only records whose field equals the value, e.g. protocol=sr")
+    parser.add_argument('--percentiles', type=float, nargs='+', default=[50, 90, 99],
+                        help="percentiles to report (default: 50 90 99)")
+    parser.add_argument('--table', help="also write the table to this file")
+    parser.add_argument('--plot', help="plot the mean (+/- std dev) of the first metric against the first group field")
+    return parser.parse_args()
+
+class Aggregate:
+    """Running count, mean, variance and extremes of one metric, plus its values for percentiles"""
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max', 'values')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.values = array('d')  # in arrival order (trial order for the task tables)
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        self.values.append(x)
+
+    @property
+    def stdev(self):
+        """Sample standard deviation (0 for a single value)"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def percentiles(self, qs):
+        """Percentiles for each q in qs, linearly interpolated between closest ranks"""
+        ordered = sorted(self.values)
+        result = []
+        for q in qs:
+            rank = (len(ordered) - 1) * q / 100
+            low = math.floor(rank)
+            high = min(low + 1, len(ordered) - 1)
+            result.append(ordered[low] + (ordered[high] - ordered[low]) * (rank - low))
+        return result
+
+def field(record, key):
+    for name in FIELD_ALIASES.get(key, (key,)):
+        if record.get(name) is not None:
+            return record[name]
+    return None
+
+def parse_where(conditions):
+    """KEY=VALUE strings -> [(key, value)], with numeric values compared as numbers"""
+    parsed = []
+    for condition in conditions:
+        key, _, value = condition.partition('=')
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+        parsed.append((key, value))
+    return parsed
+
+def read_records(filenames):
+    """Yield records from JSONL files one at a time"""
+    for filename in filenames:
+        f = sys.stdin if filename == '-' else open(filename)
+        try:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+def aggregate(records, group_by, metrics, where=()):
+    """Group records; returns ({group key tuple: {metric: Aggregate}}, first matching record, record count)"""
+    groups = {}
+    first = None
+    count = 0
+    for record in records:
+        if any(field(record, key) != value and str(field(record, key)) != str(value) for key, value in where):
+            continue
+        key = tuple(field(record, name) for name in group_by)
+        if None in key:
+            continue
+        if first is None:
+            first = record
+        count += 1
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {metric: Aggregate() for metric in metrics}
+        for metric in metrics:
+            value = field(record, metric)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                group[metric].add(value)
+    return groups, first, count
+
+def sort_key(key):
+    # Numbers before strings, so mixed columns still sort
+    return tuple((0, v, '') if isinstance(v, (int, float)) else (1, 0, str(v)) for v in key)
+
+def summary_table(groups, group_by, metrics, percentiles):
+    """Generic table: one row per group, count/mean/stdev/min/percentiles/max per metric"""
+    key_width = max([len(name) for name in group_by] + [len(str(v)) for key in groups for v in key]) + 2
+    columns = ['count', 'mean', 'stdev', 'min'] + [f"p{q:g}" for q in percentiles] + ['max']
+    lines = []
+    for metric in metrics:
+        header = ''.join(f"{name:<{key_width}}" for name in group_by) + ''.join(f"{c:>12}" for c in columns)
+        lines += [f"Metric: {metric}", header, "-" * len(header)]
+        for key in sorted(groups, key=sort_key):
+            agg = groups[key][metric]
+            row = ''.join(f"{str(v):<{key_width}}" for v in key)
+            if agg.count:
+                values = [agg.mean, agg.stdev, agg.min] + agg.percentiles(percentiles) + [agg.max]
+                row += f"{agg.count:>12}" + ''.join(f"{v:>12.4g}" for v in values)
+            else:
+                row += f"{0:>12}"
+            lines.append(row)
+        lines.append("")
+    return lines
+
+def task_table(task, groups, first):
+    """The original experiment report: one column per trial, then average and std dev"""
+    label = task['label']
+    width = task['width']
+    key_format = task.get('key_format', '{}')
+    trials = max(max(g['elapsed_time'].count for g in groups.values()), 5)
+    lines = [task['title'], "=" * 120]
+    lines.append(f"File size: {first['file_size']} bytes ({first['file_size']/1024/1024:.2f} MB)")
+    for name, key, fmt in task['context']:
+        lines.append(f"{name}: {fmt.format(first[key]) if key else fmt}")
+    lines += ["=" * 120, ""]
+    header = f"{label:<{width}} " + ''.join(f"{'Trial ' + str(i + 1):<12} " for i in range(trials))
+    lines += [header + f"{'Average':<12} {'Std Dev':<12}", "-" * 120]
+    for key in sorted(groups, key=sort_key):
+        agg = groups[key]['elapsed_time']
+        trial_str = ''.join(f"{agg.values[i]:<12.2f}" if i < agg.count else "N/A".ljust(12) for i in range(trials))
+        lines.append(f"{key_format.format(key[0]):<{width}} {trial_str} {agg.mean:<12.2f} {agg.stdev:<12.2f}")
+    lines.append("-" * 120)
+
+    extra = task.get('extra_metrics')
+    if extra:
+        lines += ["", "Additional averages per group", "-" * 60]
+        lines.append(f"{label:<{width}} " + ''.join(f"{m:<18}" for m in extra))
+        for key in sorted(groups, key=sort_key):
+            lines.append(f"{key_format.format(key[0]):<{width}} "
+                         + ''.join(f"{groups[key][m].mean:<18.1f}" for m in extra))
+        lines.append("-" * 60)
+    return lines
+
+def generate_plot(groups, group_by, metric, filename, task=None):
+    """Mean +/- std dev of metric against the first group field; one line per value of the other fields"""
+    try:
+        import matplotlib
+    except ImportError:
+        print(f"matplotlib is not installed - skipping {filename}")
+        return
+    matplotlib.use('Agg')  # Use non-interactive backend
+    import matplotlib.pyplot as plt
+
+    series = {}
+    for key in sorted(groups, key=sort_key):
+        agg = groups[key][metric]
+        if agg.count and isinstance(key[0], (int, float)):
+            series.setdefault(key[1:], []).append((key[0], agg.mean, agg.stdev))
+    if not series:
+        print("No data to plot!")
+        return
+
+    plt.figure(figsize=(12, 7))
+    for rest, points in series.items():
+        xs, means, stdevs = zip(*points)
+        label = ', '.join(f"{name}={value}" for name, value in zip(group_by[1:], rest)) or f"Average {metric}"
+        plt.errorbar(xs, means, yerr=stdevs, fmt='o-', capsize=5, capthick=2, markersize=8, linewidth=2, label=label)
+
+    xs = sorted({x for points in series.values() for x, _, _ in points})
+    if task and task.get('log2'):
+        plt.xscale('log', base=2)
+    key_format = task.get('key_format', '{}') if task else '{}'
+    plt.xticks(xs, [key_format.format(x) for x in xs], rotation=45 if len(xs) > 8 else 0)
+    plt.xlabel(task['xlabel'] if task else group_by[0], fontsize=12, fontweight='bold')
+    ylabel = 'Average Delay (seconds)' if metric == 'elapsed_time' else f"Average {metric}"
+    plt.ylabel(ylabel, fontsize=12, fontweight='bold')
+    plt.title(task['plot_title'] if task else f"{metric} by {', '.join(group_by)}", fontsize=14, fontweight='bold')
+    plt.grid(True, alpha=0.3, linestyle='--')
+    plt.legend(fontsize=10)
+    plt.tight_layout()
+    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    print(f"Plot saved to {filename}")
+
+def main():
+    args = parse_args()
+
+    task = TASKS.get(args.task)
+    if task:
+        files = args.files or [task['stats']]
+        group_by = task['group_by']
+        metrics = ['elapsed_time'] + task.get('extra_metrics', [])
+        table_file = args.table or f"task{args.task}_results.txt"
+        plot_file = args.plot or f"task{args.task}_plot.png"
+    else:
+        if not args.group_by:
+            sys.exit("error: --group-by is required without --task")
+        files = args.files or ['transfer_stats.jsonl']
+        group_by = args.group_by
+        metrics = args.metric
+        table_file = args.table
+        plot_file = args.plot
+
+    print(f"Loading statistics from {', '.join(files)}...")
+    try:
+        groups, first, count = aggregate(read_records(files), group_by, metrics, parse_where(args.where))
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found!")
+        print("Run some transfers first using Simple_ftp_client.py or benchmark_sweep.py")
+        return
+    if not groups:
+        print("No matching records.")
+        return
+
+    print(f"Found {count} transfer records in {len(groups)} groups\n")
+
+    lines = task_table(task, groups, first) if task else summary_table(groups, group_by, metrics, args.percentiles)
+    print('\n'.join(lines))
+    if table_file:
+        with open(table_file, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        print(f"\nResults saved to {table_file}")
+
+    if plot_file:
+        generate_plot(groups, group_by, metrics[0], plot_file, task)
+
+    if task:
+        missing = set(task['expected']) - {key[0] for key in groups}
+        print("\nSummary:")
+        print(f"  Total transfers: {count}")
+        print(f"  {task['label']} values completed: {len(groups)}/{len(task['expected'])}")
+        if missing:
+            print(f"  Missing values: {sorted(missing)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Many files in one transfer (client --batch)
+
+With --batch, the client's <file-name> is a manifest: a text file (or '-'
+for stdin) listing one file per line, or a directory, all of whose regular
+files are sent. The session carries one stream with every file back to
+back:
+    ENTRY (16-bit name length, 64-bit file size), UTF-8 name, file bytes
+Segments are cut from the stream without regard to file boundaries, so
+small files share full-MSS segments. Like a pipe, the stream's length is
+only known at the end, from the FIN.
+
+Names are '/'-separated paths relative to the server's output path, which
+becomes a directory. Relative manifest lines keep their path (relative to
+the manifest's directory) as the name; absolute ones are sent under their
+base name. The server skips names that are absolute or contain '..'.
+
+BatchStorage hands each file to a pool of writer threads in pieces of up to
+the write buffer size. A small file is one piece: its open, write and close
+all run on a writer thread, so many small files are written concurrently
+while the event loop keeps receiving. The pieces of a larger file are
+written in order, each one after the one before it.
+"""
+
+import os
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+ENTRY = struct.Struct('!HQ')
+
+CHUNK_SIZE = 1024 * 1024  # stream bytes returned by one BatchReader.read()
+MAX_QUEUED_BYTES = 64 * 1024 * 1024  # pieces waiting for a writer thread before append() blocks
+
+def read_manifest(manifest):
+    """[(path, name)] of the files a manifest file ('-' = stdin) or directory lists"""
+    if os.path.isdir(manifest):
+        entries = []
+        for root, dirs, files in os.walk(manifest):
+            dirs.sort()
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                if os.path.isfile(path):
+                    entries.append((path, os.path.relpath(path, manifest)))
+    else:
+        base = os.getcwd() if manifest == '-' else os.path.dirname(os.path.abspath(manifest))
+        f = sys.stdin if manifest == '-' else open(manifest)
+        with f:
+            lines = [line.strip() for line in f]
+        entries = []
+        for line in lines:
+            if not line or line.startswith('#'):
+                continue
+            if os.path.isabs(line):
+                entries.append((line, os.path.basename(line)))
+            else:
+                entries.append((os.path.join(base, line), os.path.normpath(line)))
+
+    seen = set()
+    result = []
+    for path, name in entries:
+        name = name.replace(os.sep, '/')
+        if not os.path.isfile(path):
+            raise ValueError(f"{path} is not a regular file")
+        if not safe_name(name):
+            raise ValueError(f"{path}: {name!r} is outside the output directory")
+        if name in seen:
+            raise ValueError(f"{name!r} is listed twice")
+        seen.add(name)
+        result.append((path, name))
+    return result
+
+def safe_name(name):
+    """True for a relative '/'-separated name that stays inside the output directory"""
+    parts = name.split('/')
+    return bool(name) and '\0' not in name and not name.startswith('/') and all(
+        part not in ('', '.', '..') for part in parts)
+
+class BatchReader:
+    """File-like object whose read() returns the next part of the batch stream (see file_source.StreamSource)"""
+
+    def __init__(self, entries, chunk_size=CHUNK_SIZE):
+        self.entries = entries
+        self.chunk_size = chunk_size
+        self._next = 0  # index of the next entry to open
+        self._file = None
+        self._remaining = 0  # bytes of self._file still to send
+
+        self.files = 0
+        self.file_bytes = 0
+        self.stream_bytes = 0
+
+    def read(self, size=-1):
+        """Up to chunk_size bytes of the stream, however many files that spans; b'' at the end"""
+        out = bytearray()
+        while len(out) < self.chunk_size:
+            if self._file is None:
+                if self._next == len(self.entries):
+                    break
+                path, name = self.entries[self._next]
+                self._next += 1
+                self._file = open(path, 'rb')
+                # Send the size the file has now; growing files are cut there
+                self._remaining = os.fstat(self._file.fileno()).st_size
+                encoded = name.encode()
+                out += ENTRY.pack(len(encoded), self._remaining)
+                out += encoded
+                self.files += 1
+            chunk = self._file.read(min(self._remaining, self.chunk_size - len(out)))
+            if self._remaining and not chunk:
+                raise ValueError(f"{self._file.name} shrank while being sent")
+            out += chunk
+            self._remaining -= len(chunk)
+            self.file_bytes += len(chunk)
+            if not self._remaining:
+                self._file.close()
+                self._file = None
+        self.stream_bytes += len(out)
+        return bytes(out)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        return {
+            'batch_files': self.files,
+            'batch_bytes': self.file_bytes,
+            'batch_stream_bytes': self.stream_bytes,
+        }
+
+class BatchStorage:
+    """ReceiverStorage stand-in that splits the in-order batch stream into files under a directory"""
+
+    mode = 'coalesce'  # entries only parse in order, so out-of-order segments are never written directly
+    base_offset = 0
+
+    def __init__(self, directory, threads=4, piece_size=1024 * 1024, fsync='none'):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.threads = threads
+        self.piece_size = piece_size
+        self.fsync_policy = fsync
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='batch-writer')
+        self._pending = bytearray()  # start of an entry header whose last byte has not arrived yet
+        self._path = None  # output path of the current file (None between files or while skipping one)
+        self._name = None
+        self._remaining = 0  # bytes of the current file still to come
+        self._offset = 0  # offset of self._piece in the current file
+        self._piece = bytearray()
+        self._tails = {}  # output path -> future of its last piece, which the next one waits for
+        self._queued = deque()  # (future, piece length), oldest first
+        self._queued_bytes = 0
+        self.stream_bytes = 0
+
+        self.files = 0
+        self.file_bytes = 0
+        self.skipped = []
+        self.failed = {}  # name -> first error
+        self.write_syscalls = 0
+        self.bytes_written = 0
+        self.fsync_count = 0
+        self.write_time = 0.0  # summed over writer threads
+
+    @property
+    def position(self):
+        """Stream bytes consumed so far"""
+        return self.stream_bytes
+
+    def preallocate(self, size):
+        pass  # files are created as their entries arrive
+
+    def append(self, data):
+        self.stream_bytes += len(data)
+        view = memoryview(data)
+        while view:
+            if self._remaining:
+                n = min(self._remaining, len(view))
+                if self._path is not None:
+                    self._piece += view[:n]
+                self._remaining -= n
+                view = view[n:]
+                if not self._remaining:
+                    self._submit(last=True)
+                elif len(self._piece) >= self.piece_size:
+                    self._submit(last=False)
+                continue
+
+            # Entry header: collect it whole, it may span segments
+            pending = self._pending
+            if len(pending) < ENTRY.size:
+                take = min(ENTRY.size - len(pending), len(view))
+                pending += view[:take]
+                view = view[take:]
+                if len(pending) < ENTRY.size:
+                    break
+            name_length, size = ENTRY.unpack_from(pending)
+            take = min(ENTRY.size + name_length - len(pending), len(view))
+            pending += view[:take]
+            view = view[take:]
+            if len(pending) < ENTRY.size + name_length:
+                break
+            self._start_file(bytes(pending[ENTRY.size:]).decode('utf-8', 'replace'), size)
+            pending.clear()
+        self._reap(MAX_QUEUED_BYTES)
+
+    def _start_file(self, name, size):
+        self._name = name
+        self._remaining = size
+        self._offset = 0
+        if safe_name(name):
+            self._path = os.path.join(self.directory, *name.split('/'))
+            self.files += 1
+            self.file_bytes += size
+        else:
+            print(f"Skipping {name!r}: outside {self.directory}")
+            self.skipped.append(name)
+            self._path = None
+        if not size:
+            self._submit(last=True)
+
+    def _submit(self, last):
+        """Queue the current file's buffered bytes for a writer thread"""
+        if self._path is None:
+            return
+        piece = bytes(self._piece)
+        self._piece.clear()
+        future = self._pool.submit(self._write_piece, self._path, self._tails.get(self._path),
+                                   self._offset, piece, last)
+        future.name = self._name
+        self._tails[self._path] = future
+        self._queued.append((future, len(piece)))
+        self._queued_bytes += len(piece)
+        self._offset += len(piece)
+        if last:
+            self._path = None
+
+    def _write_piece(self, path, previous, offset, piece, last):
+        """Writer thread: write one piece (creating the file first if it has none yet); returns (syscalls, fsyncs, seconds)"""
+        start = time.monotonic()
+        fd = None
+        if previous is not None:
+            fd = previous.result()[3]  # pieces of one file are queued in order, so previous is already running
+        syscalls = fsyncs = 0
+        if fd is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(piece)
+            while view:
+                written = os.pwrite(fd, view, offset)
+                syscalls += 1
+                view = view[written:]
+                offset += written
+            if last and self.fsync_policy != 'none':
+                os.fsync(fd)
+                fsyncs += 1
+        except BaseException:
+            os.close(fd)
+            raise
+        if last:
+            os.close(fd)
+            fd = None
+        return syscalls, fsyncs, time.monotonic() - start, fd
+
+    def _reap(self, limit):
+        """Account for finished pieces, waiting for the oldest ones while more than limit bytes are queued"""
+        while self._queued and (self._queued_bytes > limit or self._queued[0][0].done()):
+            future, length = self._queued.popleft()
+            self._queued_bytes -= length
+            try:
+                syscalls, fsyncs, seconds, _ = future.result()
+            except (OSError, ValueError) as e:
+                self.failed.setdefault(future.name, e)
+                continue
+            self.write_syscalls += syscalls
+            self.fsync_count += fsyncs
+            self.bytes_written += length
+            self.write_time += seconds
+
+    def flush(self):
+        # Hand over what has arrived of a large file so far
+        if self._piece:
+            self._submit(last=False)
+        self._reap(MAX_QUEUED_BYTES)
+
+    def close(self):
+        if self._pool is None:
+            return
+        if self._path is not None:
+            self._submit(last=True)  # the batch stopped inside this file
+        self._reap(0)
+        self._pool.shutdown()
+        self._pool = None
+        self._tails.clear()
+        for name, error in self.failed.items():
+            print(f"Could not write {name}: {error}")
+
+    def stats(self):
+        return {
+            'write_mode': 'batch',
+            'bytes_written': self.bytes_written,
+            'write_syscalls': self.write_syscalls,
+            'bytes_per_syscall': self.bytes_written / self.write_syscalls if self.write_syscalls else 0,
+            'fsync_policy': self.fsync_policy,
+            'fsync_count': self.fsync_count,
+            'batch_files': self.files,
+            'batch_bytes': self.file_bytes,
+            'batch_skipped': len(self.skipped),
+            'batch_failed': len(self.failed),
+            'batch_threads': self.threads,
+            'batch_write_time': self.write_time,
+        }
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Transmit backends for the client send path
+
+Both backends take a list of ready-built segments (memoryviews into the
+segment ring) and put them on the wire:
+- SendtoBackend: one sendto() per segment (the original path)
+- GSOBackend:    Linux UDP generic segmentation offload. Runs of equal-size
+                 segments are handed to one sendmsg() as scatter-gather iovecs
+                 with a UDP_SEGMENT control message, and the kernel splits them
+                 into separate datagrams. A burst of N segments costs about
+                 N / 64 syscalls. If the kernel or device rejects GSO, the
+                 backend falls back to sendto() for the rest of the transfer.
+On a non-blocking socket send() stops when the socket buffer is full and
+returns how many segments were handed to the kernel; the caller retries the
+rest once the socket is writable. If it stopped on ENOBUFS (the device queue
+is full), the socket may well stay writable, so the backend sets backoff and
+the caller retries after that many seconds instead. Any other error is
+raised.
+"""
+
+import errno
+import socket
+import struct
+import sys
+
+SOL_UDP = getattr(socket, 'SOL_UDP', 17)
+UDP_SEGMENT = getattr(socket, 'UDP_SEGMENT', 103)
+
+# Kernel limits: at most 64 segments per GSO send, within one max-size UDP datagram
+GSO_MAX_SEGMENTS = 64
+GSO_MAX_BYTES = 65507
+
+BACKENDS = ('auto', 'sendto', 'gso')
+
+# sendmsg() errors meaning the kernel or device will not take GSO sends at all
+GSO_REJECTED = (errno.EINVAL, errno.EIO, errno.EOPNOTSUPP)
+
+# Wait before retrying after ENOBUFS, doubling while sends keep failing
+BACKOFF_MIN = 0.001
+BACKOFF_MAX = 0.1
+
+class SendtoBackend:
+    """One sendto() syscall per segment"""
+
+    name = 'sendto'
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.syscalls = 0
+        self.datagrams = 0
+        self.backoff = 0.0  # seconds to wait before retrying, after ENOBUFS
+
+    def send(self, segments):
+        """Send segments in order; returns the number sent (fewer if the socket would block)"""
+        sent = 0
+        try:
+            for segment in segments:
+                self.sock.sendto(segment, self.address)
+                sent += 1
+            self.backoff = 0.0
+        except OSError as e:
+            self.send_stopped(e, sent)
+        finally:
+            self.syscalls += sent
+            self.datagrams += sent
+        return sent
+
+    def send_stopped(self, error, progress):
+        """A send stopped after progress segments: absorb a full socket buffer or ENOBUFS, raise anything else"""
+        if error.errno == errno.ENOBUFS:
+            if self.backoff and not progress:
+                self.backoff = min(2 * self.backoff, BACKOFF_MAX)
+            else:
+                self.backoff = BACKOFF_MIN
+        elif isinstance(error, BlockingIOError):
+            self.backoff = 0.0
+        else:
+            raise error
+
+class GSOBackend(SendtoBackend):
+    """Batches runs of equal-size segments into one sendmsg() with UDP_SEGMENT"""
+
+    name = 'gso'
+
+    def __init__(self, sock, address):
+        super().__init__(sock, address)
+        self.fallback = False
+
+    def send(self, segments):
+        """Send segments in order; returns the number sent (fewer if the socket would block)"""
+        if self.fallback:
+            return super().send(segments)
+
+        i = 0
+        n = len(segments)
+        while i < n:
+            # Every segment in a GSO batch has gso_size bytes except possibly the last
+            size = len(segments[i])
+            j = i + 1
+            total = size
+            while (j < n and j - i < GSO_MAX_SEGMENTS and len(segments[j]) <= size
+                   and total + len(segments[j]) <= GSO_MAX_BYTES):
+                total += len(segments[j])
+                j += 1
+                if len(segments[j - 1]) < size:
+                    break
+
+            try:
+                if j - i == 1:
+                    self.sock.sendto(segments[i], self.address)
+                else:
+                    self.sock.sendmsg(segments[i:j], [(SOL_UDP, UDP_SEGMENT, struct.pack('=H', size))],
+                                      0, self.address)
+            except OSError as e:
+                if j - i > 1 and e.errno in GSO_REJECTED:
+                    # e.g. gso_size above the path MTU, or no checksum offload on the device
+                    self.fallback = True
+                    self.name = 'sendto (gso fallback)'
+                    return i + super().send(segments[i:])
+                self.send_stopped(e, i)
+                return i
+            self.syscalls += 1
+            self.datagrams += j - i
+            i = j
+        self.backoff = 0.0
+        return n
+
+def gso_supported(sock):
+    """True if the kernel accepts the UDP_SEGMENT socket option"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        sock.setsockopt(SOL_UDP, UDP_SEGMENT, 1024)
+        sock.setsockopt(SOL_UDP, UDP_SEGMENT, 0)
+    except OSError:
+        return False
+    return True
+
+def make_backend(kind, sock, address):
+    """Create the transmit backend for kind in BACKENDS ('auto' = GSO where supported)"""
+    if kind == 'gso' or (kind == 'auto' and gso_supported(sock)):
+        return GSOBackend(sock, address)
+    return SendtoBackend(sock, address)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark the checksum engine against the original per-word loop
+
+Usage: python benchmark_checksum.py
+
+For each MSS, checksums 1 MB of random data split into MSS-sized segments
+(as the client and server do) and reports the cost per MB for:
+- reference: the original word-at-a-time Python loop
+- int:       int.from_bytes() big-integer reduction
+- numpy:     vectorized NumPy sum (only if NumPy is installed)
+Every path is checked for bit-identical results before timing.
+"""
+
+import os
+import time
+
+import checksum
+
+MSS_VALUES = [100, 200, 500, 1000, 1472, 4000, 9000, 16384, 32000, 65000]
+TOTAL_BYTES = 1024 * 1024
+
+def make_segments(mss):
+    data = os.urandom(TOTAL_BYTES)
+    return [data[i:i + mss] for i in range(0, len(data), mss)]
+
+def time_per_mb(func, segments, repeat=3):
+    """Best-of-repeat seconds to checksum all segments (1 MB)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for segment in segments:
+            func(segment)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    engines = [('reference', checksum.compute_checksum_reference),
+               ('int', lambda d: ~checksum._fold(checksum._word_sum_int(d)) & 0xFFFF)]
+    if checksum.np is not None:
+        engines.append(('numpy', lambda d: ~checksum._fold(checksum._word_sum_numpy(d)) & 0xFFFF))
+    else:
+        print("NumPy not installed - skipping the numpy engine\n")
+
+    header = f"{'MSS':<8}" + "".join(f"{name + ' (ms/MB)':<20}" for name, _ in engines) + f"{'speedup (best)':<15}"
+    print(header)
+    print("-" * len(header))
+
+    for mss in MSS_VALUES:
+        segments = make_segments(mss)
+
+        # Bit-identical check, including an odd-length tail
+        for segment in segments[:50] + [segments[-1][:-1] or b'\x01']:
+            expected = checksum.compute_checksum_reference(segment)
+            for name, func in engines:
+                assert func(segment) == expected, f"{name} mismatch at MSS={mss}"
+            assert checksum.compute_checksum(segment) == expected
+
+        times = [time_per_mb(func, segments, repeat=1 if name == 'reference' else 3)
+                 for name, func in engines]
+        speedup = times[0] / min(times[1:])
+        print(f"{mss:<8}" + "".join(f"{t * 1000:<20.2f}" for t in times) + f"{speedup:<15.1f}")
+
+    print("-" * len(header))
+
+if __name__ == "__main__":
+    main()
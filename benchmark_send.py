@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark client transmit backends on loopback
+
+Usage: python benchmark_send.py [N] [seconds]
+
+Repeatedly sends window bursts of N segments (default 1024, like Task 1's
+largest window) to a local UDP socket and reports packets per second and
+syscalls per burst for each MSS and each available backend. The receiving
+socket is not drained; loopback drops the overflow, which does not affect
+the sender-side cost being measured.
+"""
+
+import socket
+import sys
+import time
+
+from batch_sender import SendtoBackend, GSOBackend, gso_supported
+from segment_ring import SegmentRing
+
+MSS_VALUES = [100, 500, 1000, 1472]
+
+def run(backend_class, sock, address, segments, duration):
+    backend = backend_class(sock, address)
+    bursts = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        backend.send(segments)
+        bursts += 1
+    elapsed = time.perf_counter() - start
+    return backend, backend.datagrams / elapsed, backend.syscalls / bursts
+
+def main():
+    window_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    address = receiver.getsockname()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    backends = [SendtoBackend]
+    if gso_supported(sender):
+        backends.append(GSOBackend)
+    else:
+        print("UDP GSO not supported here - benchmarking sendto only\n")
+
+    header = f"{'MSS':<8}{'backend':<26}{'packets/s':<14}{'syscalls/burst':<16}{'speedup':<10}"
+    print(f"Window burst N={window_size}, {duration:.1f} s per run")
+    print(header)
+    print("-" * len(header))
+
+    for mss in MSS_VALUES:
+        ring = SegmentRing(window_size, mss)
+        payload = memoryview(bytes(range(256)) * (mss // 256 + 1))[:mss]
+        segments = [ring.fill(seq, payload) for seq in range(window_size)]
+
+        baseline = None
+        for backend_class in backends:
+            backend, pps, per_burst = run(backend_class, sender, address, segments, duration)
+            baseline = baseline or pps
+            print(f"{mss:<8}{backend.name:<26}{pps:<14.0f}{per_burst:<16.1f}{pps / baseline:<10.2f}")
+
+    print("-" * len(header))
+    sender.close()
+    receiver.close()
+
+if __name__ == "__main__":
+    main()
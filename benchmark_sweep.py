@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Parameter-sweep benchmark runner
+
+Usage: python benchmark_sweep.py [--spec sweep.json] [--window N ...] [--mss MSS ...]
+                                 [--loss p ...] [--file-size BYTES ...] [--trials T] [options]
+
+Runs every combination of window size, MSS, loss probability and file size
+for the given number of trials. Each trial starts its own server (and
+optionally a netem_proxy.py in front of it) and client on loopback, on ports
+taken from a pool, so up to --jobs trials run at once. Trials are ordered
+trial-major (every configuration once, then every configuration again) so
+slow drift on the machine does not bias one configuration. Each client stats
+record is tagged with its configuration and trial number and appended to
+--output as soon as the trial finishes. The records keep the client's fields
+(window_size, mss, elapsed_time, ...) plus loss_prob / server_probability,
+so the analysis scripts read the file directly.
+
+A spec file is JSON with the same keys as the options, e.g.
+    {"window_size": [1, 2, 4, 8], "mss": [500], "loss_prob": [0.05],
+     "file_size": [1048576], "trials": 5, "client_args": "--protocol sr",
+     "server_args": "--protocol sr", "proxy_args": "--delay 10 --rate 100"}
+Options given on the command line override the spec.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import random
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CLIENT = os.path.join(HERE, 'Simple_ftp_client.py')
+SERVER = os.path.join(HERE, 'Simple_ftp_server.py')
+PROXY = os.path.join(HERE, 'netem_proxy.py')
+
+# Loopback RTTs are well under a millisecond, so let the RTO go far below the
+# client's WAN-safe floor; --client-args may still override it
+LOOPBACK_CLIENT_ARGS = ['--min-rto', '0.05']
+
+DEFAULTS = {
+    'window_size': [64],
+    'mss': [500],
+    'loss_prob': [0.05],
+    'file_size': [1024 * 1024],
+    'trials': 5,
+    'client_args': '',
+    'server_args': '',
+    'proxy_args': None,
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run server/client pairs on loopback over a grid of N, MSS, p and file size")
+    parser.add_argument('--spec', help="JSON sweep spec (see module docstring)")
+    parser.add_argument('--window', dest='window_size', type=int, nargs='+', help="window sizes N")
+    parser.add_argument('--mss', type=int, nargs='+', help="maximum segment sizes in bytes")
+    parser.add_argument('--loss', dest='loss_prob', type=float, nargs='+', help="server loss probabilities p")
+    parser.add_argument('--file-size', type=int, nargs='+', help="file sizes in bytes (random content)")
+    parser.add_argument('--file', help="send this file instead of generated ones (ignores --file-size)")
+    parser.add_argument('--trials', type=int, help="trials per configuration (default: 5)")
+    parser.add_argument('--client-args', help="extra arguments for Simple_ftp_client.py, e.g. '--protocol sr'")
+    parser.add_argument('--server-args', help="extra arguments for Simple_ftp_server.py")
+    parser.add_argument('--proxy-args',
+                        help="run each trial through netem_proxy.py with these arguments, e.g. '--delay 10'")
+    parser.add_argument('--jobs', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="trials run in parallel; each uses two or three processes (default: half the cores)")
+    parser.add_argument('--base-port', type=int, default=20000,
+                        help="first port of the pool; trial slot k uses base + 2k and base + 2k + 1 (default: 20000)")
+    parser.add_argument('--timeout', type=float, default=600,
+                        help="give up on a trial after this many seconds (default: 600)")
+    parser.add_argument('--output', default='sweep_stats.jsonl',
+                        help="JSONL file the tagged records are appended to (default: sweep_stats.jsonl)")
+    return parser.parse_args()
+
+def load_spec(args):
+    """Merge defaults, the spec file and command-line options into one sweep spec"""
+    spec = dict(DEFAULTS)
+    if args.spec:
+        with open(args.spec) as f:
+            spec.update(json.load(f))
+    for key in DEFAULTS:
+        value = getattr(args, key)
+        if value is not None:
+            spec[key] = value
+    for key in ('window_size', 'mss', 'loss_prob', 'file_size'):
+        if not isinstance(spec[key], list):
+            spec[key] = [spec[key]]
+    return spec
+
+def make_test_files(sizes, directory):
+    """One file of random (reproducible) bytes per size"""
+    files = {}
+    for size in sizes:
+        path = os.path.join(directory, f"sweep_{size}.bin")
+        with open(path, 'wb') as f:
+            f.write(random.Random(size).randbytes(size))
+        files[size] = path
+    return files
+
+def wait_for_port(port, deadline):
+    """Wait until something is bound to the UDP port (the server or proxy is up)"""
+    if not os.path.exists('/proc/net/udp'):
+        time.sleep(0.5)  # no portable way to look without racing the bind
+        return True
+    suffix = f":{port:04X}"
+    while time.monotonic() < deadline:
+        with open('/proc/net/udp') as f:
+            next(f)
+            if any(line.split()[1].endswith(suffix) for line in f):
+                return True
+        time.sleep(0.02)
+    return False
+
+def stop(process):
+    """SIGINT a helper process (the server flushes and closes on it), killing it if it hangs"""
+    if process.poll() is None:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+def run_trial(config, trial, filename, ports, spec, timeout):
+    """One server (+ proxy) / client pair; returns the client's stats record tagged with config and trial"""
+    server_port, proxy_port = ports
+    deadline = time.monotonic() + timeout
+    with tempfile.TemporaryDirectory(prefix='sweep_') as workdir:
+        output = os.path.join(workdir, 'received.bin')
+        helpers = []
+        try:
+            helpers.append(subprocess.Popen(
+                [sys.executable, SERVER, str(server_port), output, str(config['loss_prob'])]
+                + shlex.split(spec['server_args']),
+                cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            if not wait_for_port(server_port, deadline):
+                raise RuntimeError(f"server did not start on port {server_port}")
+            target_port = server_port
+            if spec['proxy_args'] is not None:
+                helpers.append(subprocess.Popen(
+                    [sys.executable, PROXY, str(proxy_port), '127.0.0.1', str(server_port)]
+                    + shlex.split(spec['proxy_args']),
+                    cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+                if not wait_for_port(proxy_port, deadline):
+                    raise RuntimeError(f"proxy did not start on port {proxy_port}")
+                target_port = proxy_port
+
+            # The client appends its record to transfer_stats.jsonl in its working directory
+            subprocess.run(
+                [sys.executable, CLIENT, '127.0.0.1', str(target_port), filename,
+                 str(config['window_size']), str(config['mss'])] + LOOPBACK_CLIENT_ARGS + shlex.split(spec['client_args']),
+                cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                timeout=max(deadline - time.monotonic(), 1), check=True)
+        finally:
+            for process in reversed(helpers):
+                stop(process)
+
+        with open(os.path.join(workdir, 'transfer_stats.jsonl')) as f:
+            record = json.loads(f.readline())
+        with open(output, 'rb') as received, open(filename, 'rb') as sent:
+            verified = received.read() == sent.read()
+
+    record.update({
+        'loss_prob': config['loss_prob'],
+        'server_probability': config['loss_prob'],  # key used by the Task 3 records
+        'trial': trial,
+        'config': config,
+        'verified': verified,
+    })
+    return record
+
+def main():
+    args = parse_args()
+    spec = load_spec(args)
+
+    configs = []
+    for window_size, mss, loss_prob, file_size in itertools.product(
+            spec['window_size'], spec['mss'], spec['loss_prob'], spec['file_size']):
+        configs.append({
+            'window_size': window_size, 'mss': mss, 'loss_prob': loss_prob,
+            'file_size': os.path.getsize(args.file) if args.file else file_size,
+            'client_args': spec['client_args'], 'server_args': spec['server_args'],
+            'proxy_args': spec['proxy_args'],
+        })
+    runs = [(config, trial) for trial in range(1, spec['trials'] + 1) for config in configs]
+
+    # Slot k owns ports base + 2k (server) and base + 2k + 1 (proxy)
+    jobs = max(1, min(args.jobs, len(runs)))
+    ports = queue.Queue()
+    for k in range(jobs):
+        ports.put((args.base_port + 2 * k, args.base_port + 2 * k + 1))
+
+    print(f"{len(configs)} configurations x {spec['trials']} trials = {len(runs)} transfers, {jobs} in parallel")
+    print(f"Writing records to {args.output}\n")
+
+    with tempfile.TemporaryDirectory(prefix='sweep_files_') as file_dir:
+        if args.file:
+            files = {config['file_size']: args.file for config in configs}
+        else:
+            files = make_test_files(sorted(set(spec['file_size'])), file_dir)
+
+        def slot_run(config, trial):
+            pair = ports.get()
+            try:
+                return run_trial(config, trial, files[config['file_size']], pair, spec, args.timeout)
+            finally:
+                ports.put(pair)
+
+        done = failed = 0
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=jobs) as pool, open(args.output, 'a') as out:
+            futures = {pool.submit(slot_run, config, trial): (config, trial) for config, trial in runs}
+            for future in as_completed(futures):
+                config, trial = futures[future]
+                label = (f"N={config['window_size']} MSS={config['mss']} p={config['loss_prob']} "
+                         f"size={config['file_size']} trial {trial}")
+                done += 1
+                try:
+                    record = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[{done}/{len(runs)}] {label}: FAILED ({e})")
+                    continue
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                check = "" if record['verified'] else "  OUTPUT MISMATCH"
+                print(f"[{done}/{len(runs)}] {label}: {record['elapsed_time']:.2f} s, "
+                      f"{record['timeout_count']} timeouts{check}")
+
+    print(f"\n{done - failed}/{len(runs)} transfers recorded in {time.time() - start_time:.1f} s"
+          + (f", {failed} failed" if failed else ""))
+
+if __name__ == "__main__":
+    main()
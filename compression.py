@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Chunked zlib compression of the transfer stream (client --compress)
+
+A compressed transfer carries a stream of frames instead of the raw file:
+    1-byte kind (0 = raw, 1 = zlib), 32-bit big-endian length, length bytes
+Each frame holds one CHUNK_SIZE chunk of the file compressed on its own, or
+the chunk itself when compressing it does not make it smaller. Frames are
+independent, so the server decodes each one as soon as its last byte is
+delivered in order, and neither side holds more than a chunk. The framed
+stream is sent like a pipe: its length is only known at the end, from the
+FIN. Before asking for compression in the SYN, the client compresses the
+first chunk; if that does not save MIN_SAVING, the transfer goes uncompressed.
+"""
+
+import struct
+import time
+import zlib
+
+FRAME = struct.Struct('!BI')
+RAW = 0
+ZLIB = 1
+
+CHUNK_SIZE = 256 * 1024
+MIN_SAVING = 0.1  # fraction of the first chunk compression has to save to be used
+
+class CompressingReader:
+    """File-like object whose read() returns the next frame of a source (see file_source.open_source)"""
+
+    def __init__(self, source, level=6, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.level = level
+        self.chunk_size = chunk_size
+        self.position = 0  # source offset of the next chunk
+        self._first = None  # frame of chunk 0, built by worthwhile()
+
+        self.raw_bytes = 0
+        self.frame_bytes = 0
+        self.zlib_frames = 0
+        self.raw_frames = 0
+        self.cpu_time = 0.0
+
+    def _frame(self, chunk):
+        start = time.process_time()
+        packed = zlib.compress(chunk, self.level)
+        self.cpu_time += time.process_time() - start
+        if len(packed) < len(chunk):
+            return FRAME.pack(ZLIB, len(packed)) + packed
+        return FRAME.pack(RAW, len(chunk)) + chunk
+
+    def worthwhile(self):
+        """Compress the first chunk (without consuming it); True if that saves at least MIN_SAVING"""
+        chunk = self.source.view(0, self.chunk_size)
+        if not chunk:
+            return False
+        self._first = self._frame(chunk)
+        return len(self._first) <= len(chunk) * (1 - MIN_SAVING)
+
+    def read(self, size=-1):
+        """The next frame, whatever size is asked for; b'' at the end of the source"""
+        chunk = self.source.view(self.position, self.chunk_size)
+        if not chunk:
+            return b''
+        frame = self._first if self.position == 0 and self._first is not None else self._frame(chunk)
+        self._first = None
+        if frame[0] == ZLIB:
+            self.zlib_frames += 1
+        else:
+            self.raw_frames += 1
+        self.position += len(chunk)
+        self.source.release(self.position)
+        self.raw_bytes += len(chunk)
+        self.frame_bytes += len(frame)
+        return frame
+
+    def close(self):
+        self.source.close()
+
+    def stats(self):
+        return {
+            'compression': 'zlib',
+            'compressed_bytes': self.frame_bytes,
+            'compression_ratio': self.frame_bytes / self.raw_bytes if self.raw_bytes else 1.0,
+            'compress_cpu_time': self.cpu_time,
+            'zlib_frames': self.zlib_frames,
+            'raw_frames': self.raw_frames,
+        }
+
+class DecompressingStorage:
+    """ReceiverStorage wrapper that decodes the in-order frame stream and appends the decompressed chunks"""
+
+    mode = 'coalesce'  # frames only decode in order, so out-of-order segments are never written directly
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._pending = bytearray()  # start of a frame whose last byte has not arrived yet
+        self.frame_bytes = 0
+        self.cpu_time = 0.0
+
+    @property
+    def position(self):
+        """Decompressed bytes written so far (always at a chunk boundary)"""
+        return self.storage.position
+
+    def preallocate(self, size):
+        self.storage.preallocate(size)
+
+    def append(self, data):
+        self.frame_bytes += len(data)
+        pending = self._pending
+        pending += data
+        start = 0
+        while len(pending) - start >= FRAME.size:
+            kind, length = FRAME.unpack_from(pending, start)
+            end = start + FRAME.size + length
+            if len(pending) < end:
+                break
+            with memoryview(pending)[start + FRAME.size:end] as body:
+                if kind == ZLIB:
+                    t = time.process_time()
+                    chunk = zlib.decompress(body)
+                    self.cpu_time += time.process_time() - t
+                    self.storage.append(chunk)
+                elif kind == RAW:
+                    self.storage.append(body)
+                else:
+                    raise ValueError(f"unknown frame kind {kind}")
+            start = end
+        if start:
+            del pending[:start]
+
+    def flush(self):
+        self.storage.flush()
+
+    def close(self):
+        self.storage.close()
+
+    def stats(self):
+        stats = self.storage.stats()
+        written = self.storage.position - self.storage.base_offset
+        stats.update({
+            'compressed_bytes': self.frame_bytes,
+            'compression_ratio': self.frame_bytes / written if written else 1.0,
+            'decompress_cpu_time': self.cpu_time,
+        })
+        return stats
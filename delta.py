@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+rsync-style delta transfer against the server's existing copy (client --delta)
+
+Before its SYN, the client asks the server for the block signatures of the file
+already at the output path: for each full block of block_size bytes, a 32-bit
+rolling checksum and a 16-byte BLAKE2b digest. The server picks the block size
+from the size of its copy and sends the signatures back in pages. The client
+then makes one pass over its own file, rolling the weak checksum along a byte
+at a time. Wherever the weak checksum and then the digest match one of the
+server's blocks, it sends a reference to that block instead of the bytes. The
+transfer carries a stream of ops instead of the raw file:
+    1-byte kind, 64-bit offset, 32-bit length
+    LITERAL: offset 0, followed by length bytes of new data
+    COPY:    length bytes at offset in the server's old copy
+Runs of consecutive matching blocks become one COPY. Like a compressed stream,
+the op stream is sent like a pipe: its length is only known at the end, from
+the FIN. The server moves its old copy aside to <output>.basis and rebuilds
+the file from the ops and the basis. It removes the basis once the transfer
+completes, or puts it back if the transfer does not, or if the new file turns
+out to be the old copy itself (which then keeps its mtime).
+
+The server caches signatures per output file, keyed on its size and mtime,
+so repeated syncs against an unchanged copy do not hash it again. Given an
+event loop, the cache signs files on a worker thread and has no answer until
+they are done; the client just asks again. NumPy, when installed, computes
+the rolling checksums a chunk at a time.
+"""
+
+import hashlib
+import math
+import os
+import struct
+import time
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Basis size, basis mtime in ns, block size, first block, block count; the request
+# leaves the basis fields and (to let the server choose) the block size zero
+SIGNATURES = struct.Struct('!QQIII')
+BLOCK = struct.Struct('!I16s')  # weak rolling checksum, strong digest
+OP = struct.Struct('!BQI')
+LITERAL = 0
+COPY = 1
+
+MIN_BLOCK_SIZE = 700
+MAX_BLOCK_SIZE = 128 * 1024
+CHUNK_SIZE = 1024 * 1024  # client bytes matched per read()
+COPY_READ_SIZE = 1024 * 1024  # server reads of the basis per COPY
+
+def block_size_for(size):
+    """Block size for a basis of size bytes: about its square root, as rsync picks it"""
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, math.isqrt(size) // 8 * 8))
+
+def weak_checksum(block):
+    """rsync rolling checksum: a = sum of the bytes, b = sum of the prefix sums, both mod 2^16"""
+    return (sum(block) & 0xFFFF) | (sum(accumulate(block)) & 0xFFFF) << 16
+
+def strong_digest(block):
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+def _block_weak_numpy(data, block_size):
+    """weak_checksum() of each full block of data"""
+    rows = np.frombuffer(data, dtype=np.uint8, count=len(data) // block_size * block_size).reshape(-1, block_size)
+    a = rows.sum(axis=1, dtype=np.int64)
+    b = rows @ np.arange(block_size, 0, -1, dtype=np.int64)
+    return ((a & 0xFFFF) | (b & 0xFFFF) << 16).tolist()
+
+def block_signatures(path, block_size):
+    """Packed BLOCK signatures of every full block of path"""
+    signatures = bytearray()
+    read_size = max(1, CHUNK_SIZE // block_size) * block_size
+    with open(path, 'rb') as f:
+        while data := f.read(read_size):
+            full = len(data) // block_size * block_size
+            if np is not None:
+                weaks = _block_weak_numpy(data, block_size)
+            else:
+                weaks = [weak_checksum(data[i:i + block_size]) for i in range(0, full, block_size)]
+            with memoryview(data) as view:
+                for i, weak in zip(range(0, full, block_size), weaks):
+                    signatures += BLOCK.pack(weak, strong_digest(view[i:i + block_size]))
+            if full < len(data):
+                break
+    return bytes(signatures)
+
+def _rolling_numpy(data, block_size, count):
+    """Weak checksums of the count windows data[k:k + block_size], from prefix sums (only their low 16 bits
+    matter, so everything is computed modulo 2^32)"""
+    x = np.frombuffer(data, dtype=np.uint8, count=count + block_size - 1)
+    index = np.arange(len(x), dtype=np.uint32)
+    s1 = np.zeros(len(x) + 1, dtype=np.uint32)
+    np.cumsum(x, dtype=np.uint32, out=s1[1:])
+    s2 = np.zeros(len(x) + 1, dtype=np.uint32)
+    np.cumsum(x * index, dtype=np.uint32, out=s2[1:])
+    a = s1[block_size:block_size + count] - s1[:count]
+    b = (index[:count] + np.uint32(block_size)) * a - (s2[block_size:block_size + count] - s2[:count])
+    return (a & 0xFFFF) | (b & 0xFFFF) << 16
+
+def _rolling_python(data, block_size, count):
+    """Same as _rolling_numpy, rolling a and b along one byte at a time"""
+    a = sum(data[:block_size])
+    b = sum(accumulate(data[:block_size]))
+    for k in range(count):
+        yield k, (a & 0xFFFF) | (b & 0xFFFF) << 16
+        if k + 1 < count:
+            out, new = data[k], data[k + block_size]
+            a += new - out
+            b += a - block_size * out
+
+class DeltaEncoder:
+    """File-like object whose read() returns the ops for the next stretch of a source (see file_source.open_source)"""
+
+    def __init__(self, source, block_size, signatures, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.block_size = block_size
+        self.chunk_size = chunk_size
+        self.blocks = {}  # weak checksum -> {strong digest: block index}
+        for index, (weak, strong) in enumerate(BLOCK.iter_unpack(signatures)):
+            self.blocks.setdefault(weak, {}).setdefault(strong, index)
+        if np is not None:
+            # Sorted weak checksums, and a 16-bit hash table of them that rules out most windows cheaply
+            self._weak_keys = np.sort(np.fromiter(self.blocks, dtype=np.uint32, count=len(self.blocks)))
+            self._tags = np.zeros(1 << 16, dtype=bool)
+            self._tags[(self._weak_keys ^ self._weak_keys >> 16) & 0xFFFF] = True
+        self.position = 0  # source offset of the first byte no op covers yet
+        self._run = None  # [basis offset, length] of a COPY the next match may extend
+        self._done = False
+
+        self.raw_bytes = 0
+        self.literal_bytes = 0
+        self.copied_bytes = 0
+        self.op_bytes = 0
+        self.cpu_time = 0.0
+
+    def _candidates(self, data, count):
+        """(offset, weak checksum) of the windows whose weak checksum some block has"""
+        if count <= 0:
+            return
+        if np is not None:
+            keys = self._weak_keys
+            if not len(keys):
+                return
+            weaks = _rolling_numpy(data, self.block_size, count)
+            tagged = np.flatnonzero(self._tags[(weaks ^ weaks >> 16) & 0xFFFF])
+            weaks = weaks[tagged]
+            found = keys[np.minimum(np.searchsorted(keys, weaks), len(keys) - 1)] == weaks
+            for k, weak in zip(tagged[found].tolist(), weaks[found].tolist()):
+                yield k, weak
+        else:
+            blocks = self.blocks
+            for k, weak in _rolling_python(data, self.block_size, count):
+                if weak in blocks:
+                    yield k, weak
+
+    def _copy(self, ops, index):
+        offset = index * self.block_size
+        if self._run is not None and self._run[0] + self._run[1] == offset:
+            self._run[1] += self.block_size
+            return
+        self._end_run(ops)
+        self._run = [offset, self.block_size]
+
+    def _end_run(self, ops):
+        if self._run is not None:
+            ops += OP.pack(COPY, *self._run)
+            self.copied_bytes += self._run[1]
+            self._run = None
+
+    def _literal(self, ops, data):
+        if data:
+            self._end_run(ops)
+            ops += OP.pack(LITERAL, 0, len(data))
+            ops += data
+            self.literal_bytes += len(data)
+
+    def _encode_chunk(self, ops):
+        """Add the ops for windows starting in the next chunk_size bytes; False at the end of the source"""
+        block_size = self.block_size
+        data = self.source.view(self.position, self.chunk_size + block_size - 1)
+        at_end = len(data) < self.chunk_size + block_size - 1
+        count = max(0, min(self.chunk_size, len(data) - block_size + 1))
+
+        start = 0  # first byte not covered by an op yet
+        for k, weak in self._candidates(data, count):
+            if k < start:
+                continue  # inside the block just matched
+            index = self.blocks[weak].get(strong_digest(data[k:k + block_size]))
+            if index is not None:
+                self._literal(ops, data[start:k])
+                self._copy(ops, index)
+                start = k + block_size
+        end = len(data) if at_end else max(start, count)
+        self._literal(ops, data[start:end])
+        self.position += end
+        self.source.release(self.position)
+        self.raw_bytes += end
+        if at_end:
+            self._end_run(ops)
+        return not at_end
+
+    def read(self, size=-1):
+        """The ops for the next chunk(s) of the source, whatever size is asked for; b'' at the end"""
+        ops = bytearray()
+        start = time.process_time()
+        while not ops and not self._done:
+            self._done = not self._encode_chunk(ops)
+        self.cpu_time += time.process_time() - start
+        self.op_bytes += len(ops)
+        return bytes(ops)
+
+    def close(self):
+        self.source.close()
+
+    def stats(self):
+        return {
+            'delta_copied_bytes': self.copied_bytes,
+            'delta_literal_bytes': self.literal_bytes,
+            'delta_wire_bytes': self.op_bytes,
+            'delta_cpu_time': self.cpu_time,
+        }
+
+class SignatureCache:
+    """Signatures of output files, recomputed only when a file's size or mtime changes"""
+
+    def __init__(self, loop=None):
+        self.loop = loop  # with a loop, files are signed in its default executor
+        self.entries = {}  # path -> (size, mtime_ns, block size, packed signatures)
+        self.pending = {}  # path -> future of signatures being computed
+
+    def get(self, path):
+        """(size, mtime_ns, block size, packed signatures) of path; all zero / empty if it does not exist,
+        None while it is being signed in the background"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return 0, 0, 0, b''
+        entry = self.entries.get(path)
+        if entry is not None and entry[:2] == (st.st_size, st.st_mtime_ns):
+            return entry
+        if self.loop is None:
+            entry = self.entries[path] = self._sign(path, st.st_size, st.st_mtime_ns)
+            return entry
+        if path not in self.pending:
+            future = self.pending[path] = self.loop.run_in_executor(None, self._sign, path, st.st_size,
+                                                                    st.st_mtime_ns)
+            future.add_done_callback(lambda done: self._signed(path, done))
+        return None
+
+    def _signed(self, path, done):
+        del self.pending[path]
+        if not done.cancelled() and done.exception() is None:
+            self.entries[path] = done.result()
+
+    @staticmethod
+    def _sign(path, size, mtime_ns):
+        start = time.perf_counter()
+        block_size = block_size_for(size)
+        entry = (size, mtime_ns, block_size, block_signatures(path, block_size))
+        print(f"Signed {path}: {len(entry[3]) // BLOCK.size} blocks of {block_size} bytes "
+              f"in {time.perf_counter() - start:.3f} seconds")
+        return entry
+
+def basis_path(path):
+    return path + '.basis'
+
+def set_aside(path):
+    """Move the existing output file to its basis path; True if there was one"""
+    try:
+        os.replace(path, basis_path(path))
+        return True
+    except FileNotFoundError:
+        return False
+
+def restore_basis(path):
+    """Put the old copy back in place of an incomplete rebuild"""
+    try:
+        os.replace(basis_path(path), path)
+    except FileNotFoundError:
+        pass
+
+def remove_basis(path):
+    try:
+        os.remove(basis_path(path))
+    except FileNotFoundError:
+        pass
+
+class DeltaStorage:
+    """ReceiverStorage wrapper that applies the in-order op stream, copying matched blocks from the basis"""
+
+    mode = 'coalesce'  # ops only decode in order, so out-of-order segments are never written directly
+
+    def __init__(self, storage, path):
+        self.storage = storage
+        self.basis_fd = os.open(path, os.O_RDONLY) if os.path.exists(path) else None
+        self.has_basis = self.basis_fd is not None
+        self.basis_size = os.fstat(self.basis_fd).st_size if self.has_basis else 0
+        self._pending = bytearray()  # start of an op whose bytes have not all arrived yet
+        self._identical_up_to = 0  # length of the output so far if it is a prefix of the basis, else None
+        self.op_bytes = 0
+        self.copied_bytes = 0
+        self.literal_bytes = 0
+
+    @property
+    def position(self):
+        return self.storage.position
+
+    def preallocate(self, size):
+        self.storage.preallocate(size)
+
+    def _copy(self, offset, length):
+        if self.basis_fd is None:
+            raise ValueError("COPY op but there is no basis file")
+        while length > 0:
+            data = os.pread(self.basis_fd, min(length, COPY_READ_SIZE), offset)
+            if not data:
+                raise ValueError(f"COPY op past the end of the basis file (offset {offset})")
+            self.storage.append(data)
+            offset += len(data)
+            length -= len(data)
+
+    def append(self, data):
+        self.op_bytes += len(data)
+        pending = self._pending
+        pending += data
+        start = 0
+        while len(pending) - start >= OP.size:
+            kind, offset, length = OP.unpack_from(pending, start)
+            if kind == COPY:
+                self._copy(offset, length)
+                self.copied_bytes += length
+                if self._identical_up_to == offset:
+                    self._identical_up_to += length
+                else:
+                    self._identical_up_to = None
+                start += OP.size
+            elif kind == LITERAL:
+                end = start + OP.size + length
+                if len(pending) < end:
+                    break
+                with memoryview(pending)[start + OP.size:end] as body:
+                    self.storage.append(body)
+                    if self._identical_up_to is not None:
+                        # e.g. the short last block, which has no signature
+                        same = self.has_basis and os.pread(self.basis_fd, length, self._identical_up_to) == body
+                        self._identical_up_to = self._identical_up_to + length if same else None
+                self.literal_bytes += length
+                start = end
+            else:
+                raise ValueError(f"unknown op kind {kind}")
+        if start:
+            del pending[:start]
+
+    @property
+    def unchanged(self):
+        """True if the rebuilt file is the basis itself"""
+        return self.has_basis and self._identical_up_to == self.basis_size
+
+    def flush(self):
+        self.storage.flush()
+
+    def close(self):
+        if self.basis_fd is not None:
+            os.close(self.basis_fd)
+            self.basis_fd = None
+        self.storage.close()
+
+    def stats(self):
+        stats = self.storage.stats()
+        stats.update({
+            'delta_wire_bytes': self.op_bytes,
+            'delta_copied_bytes': self.copied_bytes,
+            'delta_literal_bytes': self.literal_bytes,
+        })
+        return stats
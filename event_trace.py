@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Per-segment event tracing for the client and server
+
+Usage: python event_trace.py <trace> [<trace> ...] [--interval 0.1] [--rtt-csv rtt.csv] [--goodput-csv goodput.csv]
+
+EventTrace records one event per segment-level action into preallocated
+array columns (monotonic timestamp in ns, sequence number, value, event,
+cause). When the arrays fill up they are written to the trace file as one
+binary chunk, so tracing costs a few array stores per event and one write
+per 64K events. Client events: SEND, RETRANSMIT (cause timeout / fast), ACK
+(cause new / duplicate / stale). Server events: DROP (loss service),
+ACCEPT (cause fec when rebuilt from parity), DISCARD (cause out of order /
+checksum / duplicate / outside window).
+
+Trace file:
+    header: magic b'SFTR', version, role (1 = client, 2 = server),
+            monotonic_ns and time_ns taken together at start (to line up
+            traces from both ends on a wall clock)
+    chunks: uint32 count, then count int64 timestamps, count uint64 seqs,
+            count uint64 values, count uint8 events, count uint8 causes
+All fields are little-endian.
+
+Run as a script, the reader prints event counts and, from a client trace,
+RTT samples (segments ACKed after one transmission - Karn's rule), goodput
+over time and retransmission causes. Given the server trace as well, each
+retransmission is explained by what happened to the segment's previous
+copy at the server (not arrived yet, dropped, discarded or already accepted).
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+from array import array
+
+from ftp_protocol import SEQ_MASK
+
+MAGIC = b'SFTR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sBBqq')
+CHUNK_HEADER = struct.Struct('<I')
+
+CLIENT = 1
+SERVER = 2
+ROLES = {CLIENT: 'client', SERVER: 'server'}
+
+# Events
+SEND = 1        # value = payload length
+RETRANSMIT = 2  # value = payload length, cause = CAUSE_TIMEOUT / CAUSE_FAST
+ACK = 3         # seq = ACKed segment, value = window base afterwards, cause = CAUSE_NEW / _DUPLICATE / _STALE
+DROP = 4        # value = payload length (server loss service)
+ACCEPT = 5      # value = payload length, cause = CAUSE_FEC for a segment rebuilt from parity
+DISCARD = 6     # value = payload length, cause = CAUSE_OUT_OF_ORDER / _CHECKSUM / _DUPLICATE / _OUTSIDE_WINDOW
+EVENT_NAMES = {SEND: 'send', RETRANSMIT: 'retransmit', ACK: 'ack', DROP: 'drop', ACCEPT: 'accept', DISCARD: 'discard'}
+
+CAUSE_NONE = 0
+CAUSE_TIMEOUT = 1
+CAUSE_FAST = 2
+CAUSE_NEW = 3
+CAUSE_DUPLICATE = 4
+CAUSE_STALE = 5
+CAUSE_OUT_OF_ORDER = 6
+CAUSE_CHECKSUM = 7
+CAUSE_OUTSIDE_WINDOW = 8
+CAUSE_FEC = 9
+CAUSE_NAMES = {CAUSE_NONE: '', CAUSE_TIMEOUT: 'timeout', CAUSE_FAST: 'fast', CAUSE_NEW: 'new',
+               CAUSE_DUPLICATE: 'duplicate', CAUSE_STALE: 'stale', CAUSE_OUT_OF_ORDER: 'out of order',
+               CAUSE_CHECKSUM: 'checksum', CAUSE_OUTSIDE_WINDOW: 'outside window', CAUSE_FEC: 'fec'}
+
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+def numbered_path(pattern, n, **fields):
+    """Fill {placeholders} in pattern, or else insert .n before the extension (unless n is None)"""
+    if '{' in pattern:
+        return pattern.format(**fields)
+    if n is None:
+        return pattern
+    stem, ext = os.path.splitext(pattern)
+    return f"{stem}.{n}{ext}"
+
+class EventTrace:
+    """Preallocated column buffers of trace events, flushed to a binary file in chunks"""
+
+    def __init__(self, path, role, capacity=65536):
+        self.capacity = capacity
+        self.times = array('q', bytes(8 * capacity))
+        self.seqs = array('Q', bytes(8 * capacity))
+        self.values = array('Q', bytes(8 * capacity))
+        self.events = array('B', bytes(capacity))
+        self.causes = array('B', bytes(capacity))
+        self.count = 0
+        self.file = open(path, 'wb')
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, role, time.monotonic_ns(), time.time_ns()))
+
+    def record(self, event, seq, value=0, cause=CAUSE_NONE):
+        i = self.count
+        self.times[i] = time.monotonic_ns()
+        self.seqs[i] = seq
+        self.values[i] = value
+        self.events[i] = event
+        self.causes[i] = cause
+        self.count = i + 1
+        if self.count == self.capacity:
+            self.flush()
+
+    def flush(self):
+        n = self.count
+        if not n:
+            return
+        self.file.write(CHUNK_HEADER.pack(n))
+        for column in (self.times, self.seqs, self.values, self.events, self.causes):
+            if not LITTLE_ENDIAN and column.itemsize > 1:
+                column = array(column.typecode, column[:n])
+                column.byteswap()
+            self.file.write(memoryview(column).cast('B')[:n * column.itemsize])
+        self.count = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+def read_trace(path):
+    """Returns (role, wall-clock offset in ns to add to timestamps, [(time_ns, seq, value, event, cause), ...])"""
+    with open(path, 'rb') as f:
+        magic, version, role, mono_start, wall_start = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} trace file")
+        records = []
+        while header := f.read(CHUNK_HEADER.size):
+            (n,) = CHUNK_HEADER.unpack(header)
+            columns = []
+            for typecode in 'qQQBB':
+                column = array(typecode)
+                column.frombytes(f.read(n * column.itemsize))
+                if not LITTLE_ENDIAN and column.itemsize > 1:
+                    column.byteswap()
+                columns.append(column)
+            records.extend(zip(*columns))
+    return role, wall_start - mono_start, records
+
+def percentile(ordered, q):
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def rtt_samples(records):
+    """(time_ns, seq, rtt seconds) for segments ACKed after exactly one transmission"""
+    first_sent = {}
+    samples = []
+    for t, seq, _, event, cause in records:
+        if event == SEND:
+            first_sent[seq] = t
+        elif event == RETRANSMIT:
+            first_sent[seq] = None
+        elif event == ACK and cause == CAUSE_NEW and first_sent.get(seq) is not None:
+            samples.append((t, seq, (t - first_sent[seq]) / 1e9))
+    return samples
+
+def goodput(records, interval):
+    """[(seconds since first event, Mbit/s)] of newly ACKed payload per interval"""
+    if not records:
+        return []
+    lengths = {}
+    acked_base = 0
+    start = records[0][0]
+    bins = {}
+    for t, seq, value, event, cause in records:
+        if event == SEND:
+            lengths[seq] = value
+        elif event == ACK and value > acked_base:
+            nbytes = sum(lengths.get(s, 0) for s in range(acked_base, value))
+            acked_base = value
+            slot = int((t - start) / 1e9 / interval)
+            bins[slot] = bins.get(slot, 0) + nbytes
+    if not bins:
+        return []
+    return [(slot * interval, bins.get(slot, 0) * 8 / interval / 1e6) for slot in range(max(bins) + 1)]
+
+def retransmission_causes(client_records, client_offset, server_records=None, server_offset=0):
+    """Count retransmissions by trigger, and (with a server trace) by what became of the previous copy"""
+    by_trigger = {}
+    by_fate = {}
+    fates = {}  # wire seq -> [(wall time, event, cause)] at the server
+    if server_records:
+        for t, seq, _, event, cause in server_records:
+            fates.setdefault(seq, []).append((t + server_offset, event, cause))
+
+    last_sent = {}
+    for t, seq, _, event, cause in client_records:
+        if event == SEND:
+            last_sent[seq] = t + client_offset
+        elif event == RETRANSMIT:
+            trigger = CAUSE_NAMES[cause]
+            by_trigger[trigger] = by_trigger.get(trigger, 0) + 1
+            if server_records is not None:
+                # Latest thing the server did with this segment between the previous copy and now
+                wall = t + client_offset
+                fate = 'not arrived yet (lost or in flight)'
+                for st, s_event, s_cause in fates.get(seq & SEQ_MASK, ()):
+                    if last_sent.get(seq, 0) <= st <= wall:
+                        if s_event == ACCEPT:
+                            fate = 'already accepted (ACK lost or late)'
+                        elif s_event == DROP:
+                            fate = 'dropped by loss service'
+                        else:
+                            fate = f"discarded ({CAUSE_NAMES[s_cause]})"
+                by_fate[fate] = by_fate.get(fate, 0) + 1
+            last_sent[seq] = t + client_offset
+    return by_trigger, by_fate
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Summarize client/server event traces")
+    parser.add_argument('traces', nargs='+', help="trace files written with --trace (client and/or server)")
+    parser.add_argument('--interval', type=float, default=0.1,
+                        help="goodput bucket width in seconds (default: 0.1)")
+    parser.add_argument('--rtt-csv', help="write RTT samples (time_s, seq, rtt_s) to this CSV file")
+    parser.add_argument('--goodput-csv', help="write goodput (time_s, mbps) to this CSV file")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    traces = {}
+    for path in args.traces:
+        role, offset, records = read_trace(path)
+        traces[role] = (offset, records)
+        counts = {}
+        for _, _, _, event, cause in records:
+            name = EVENT_NAMES[event] + (f" ({CAUSE_NAMES[cause]})" if cause else "")
+            counts[name] = counts.get(name, 0) + 1
+        duration = (records[-1][0] - records[0][0]) / 1e9 if records else 0
+        print(f"{path}: {ROLES[role]} trace, {len(records)} events over {duration:.3f} seconds")
+        for name in sorted(counts):
+            print(f"  {name:<28}{counts[name]:>10}")
+        print()
+
+    if CLIENT not in traces:
+        return
+    client_offset, client_records = traces[CLIENT]
+    start = client_records[0][0] if client_records else 0
+
+    samples = rtt_samples(client_records)
+    if samples:
+        ordered = sorted(rtt for _, _, rtt in samples)
+        print(f"RTT samples: {len(samples)}  min {ordered[0] * 1000:.2f} ms  p50 {percentile(ordered, 50) * 1000:.2f} ms  "
+              f"p90 {percentile(ordered, 90) * 1000:.2f} ms  max {ordered[-1] * 1000:.2f} ms")
+    if args.rtt_csv:
+        with open(args.rtt_csv, 'w') as f:
+            f.write("time_s,seq,rtt_s\n")
+            for t, seq, rtt in samples:
+                f.write(f"{(t - start) / 1e9:.6f},{seq},{rtt:.6f}\n")
+
+    series = goodput(client_records, args.interval)
+    if series:
+        rates = [rate for _, rate in series]
+        print(f"Goodput per {args.interval:g} s: mean {sum(rates) / len(rates):.2f} Mbit/s, "
+              f"max {max(rates):.2f} Mbit/s, {sum(1 for r in rates if r == 0)} of {len(rates)} intervals idle")
+    if args.goodput_csv:
+        with open(args.goodput_csv, 'w') as f:
+            f.write("time_s,mbps\n")
+            for t, rate in series:
+                f.write(f"{t:.3f},{rate:.4f}\n")
+
+    server = traces.get(SERVER)
+    by_trigger, by_fate = retransmission_causes(client_records, client_offset,
+                                                server[1] if server else None, server[0] if server else 0)
+    if by_trigger:
+        print("Retransmissions by trigger: " + ", ".join(f"{k} {v}" for k, v in sorted(by_trigger.items())))
+    if by_fate:
+        print("Retransmissions by fate of the previous copy at the server:")
+        for fate, n in sorted(by_fate.items(), key=lambda item: -item[1]):
+            print(f"  {fate:<40}{n:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+XOR parity forward error correction (client --fec K)
+
+The client follows every K data segments (and the last, possibly shorter,
+group) with one parity segment. The parity holds the XOR of the group's
+payloads, each zero-padded to the longest, and the XOR of their lengths. The
+server keeps the same running XOR over the segments of each group it receives.
+Once the parity is in and exactly one segment of the group is missing, XORing
+the two gives back that segment, which is then delivered without waiting for
+a retransmission.
+
+Parity segment: header with the wire sequence number of the group's first
+segment, the checksum of the payload and type 1111..., then the PARITY
+descriptor and the XOR bytes. With FEC on, the FIN-ACK carries a REPORT of
+how many segments the server rebuilt.
+"""
+
+import struct
+
+from checksum import compute_checksum
+from ftp_protocol import HEADER, FEC_PACKET_TYPE, SEQ_MASK
+
+PARITY = struct.Struct('!HH')  # segments in the group, XOR of their lengths
+REPORT = struct.Struct('!Q')  # segments rebuilt from parity, appended to the FIN-ACK
+
+class ParityAccumulator:
+    """Running XOR of a group's payloads (as little-endian integers, so padding is trailing zeros)"""
+
+    def __init__(self):
+        self.xor = 0
+        self.length_xor = 0
+        self.max_length = 0
+        self.count = 0
+
+    def add(self, payload):
+        length = len(payload)
+        self.xor ^= int.from_bytes(payload, 'little')
+        self.length_xor ^= length
+        if length > self.max_length:
+            self.max_length = length
+        self.count += 1
+
+    def packet(self, first_seq):
+        """The parity segment of the group so far, whose first segment is first_seq"""
+        payload = PARITY.pack(self.count, self.length_xor) + self.xor.to_bytes(self.max_length, 'little')
+        return HEADER.pack(first_seq & SEQ_MASK, compute_checksum(payload), FEC_PACKET_TYPE) + payload
+
+class ParityGroup(ParityAccumulator):
+    """Receiver side of one group: the segments that have arrived and, once it arrives, the parity"""
+
+    def __init__(self, first_seq):
+        super().__init__()
+        self.first_seq = first_seq
+        self.received = set()
+        self.parity = None  # (count, length XOR, payload XOR)
+
+    def add_segment(self, seq, payload):
+        if seq not in self.received:
+            self.received.add(seq)
+            self.add(payload)
+
+    def set_parity(self, payload):
+        count, length_xor = PARITY.unpack_from(payload)
+        self.parity = (count, length_xor, int.from_bytes(payload[PARITY.size:], 'little'))
+
+    def rebuild(self):
+        """(seq, payload) of the group's one missing segment, or None if that cannot be worked out (yet)"""
+        if self.parity is None:
+            return None
+        count, length_xor, xor = self.parity
+        if len(self.received) != count - 1:
+            return None
+        seq = next(s for s in range(self.first_seq, self.first_seq + count) if s not in self.received)
+        try:
+            return seq, (xor ^ self.xor).to_bytes(length_xor ^ self.length_xor, 'little')
+        except OverflowError:
+            return None  # inconsistent with what arrived
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Streaming input for the sender
+
+open_source() returns an object with:
+- view(offset, length): payload bytes at offset (shorter or empty at end of file)
+- release(offset):      data before offset has been ACKed and will not be resent
+- size:                 total size in bytes, or None while still unknown (pipes)
+- close()
+
+Regular files are mmap'ed, so payloads are zero-copy memoryview slices and only
+pages around the in-flight window are resident; released ranges are dropped
+from the mapping in large chunks. Pipes and stdin ('-') are read ahead in
+chunks into a buffer that is trimmed as the window slides. A regular file can
+also be opened as a byte range (offset, length), which is how striped
+transfers give each sender its part.
+"""
+
+import mmap
+import os
+import stat
+import sys
+
+# Granularity for dropping released mmap pages / trimming the read-ahead buffer
+RELEASE_CHUNK = 64 * 1024 * 1024
+READ_AHEAD_CHUNK = 1024 * 1024
+
+class MappedSource:
+    """Regular file accessed through a read-only memory map"""
+
+    def __init__(self, f, offset=0, length=None):
+        self._file = f
+        file_size = os.fstat(f.fileno()).st_size
+        self._offset = min(offset, file_size)
+        self.size = file_size - self._offset
+        if length is not None:
+            self.size = min(self.size, length)
+        self._map = None
+        self._view = memoryview(b'')
+        self._released = self._offset - self._offset % mmap.PAGESIZE
+        if self.size:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._map, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                self._map.madvise(mmap.MADV_SEQUENTIAL)
+            self._view = memoryview(self._map)
+
+    def view(self, offset, length):
+        return self._view[self._offset + offset:self._offset + min(offset + length, self.size)]
+
+    def release(self, offset):
+        offset += self._offset
+        if self._map is None or offset - self._released < RELEASE_CHUNK:
+            return
+        end = offset - offset % mmap.PAGESIZE
+        if hasattr(self._map, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+            self._map.madvise(mmap.MADV_DONTNEED, self._released, end - self._released)
+        self._released = end
+
+    def close(self):
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+class StreamSource:
+    """Non-seekable input (pipe, FIFO, stdin) read ahead into a sliding buffer"""
+
+    def __init__(self, f):
+        self._file = f
+        self.size = None
+        self._buffer = bytearray()
+        self._buffer_start = 0  # file offset of self._buffer[0]
+
+    def view(self, offset, length):
+        end = offset + length
+        while self.size is None and self._buffer_start + len(self._buffer) < end:
+            chunk = self._file.read(READ_AHEAD_CHUNK)
+            if not chunk:
+                self.size = self._buffer_start + len(self._buffer)
+                break
+            self._buffer += chunk
+        start = offset - self._buffer_start
+        # Copy out: a memoryview export would stop the buffer from being trimmed
+        return bytes(self._buffer[start:start + length])
+
+    def release(self, offset):
+        if offset - self._buffer_start >= READ_AHEAD_CHUNK:
+            del self._buffer[:offset - self._buffer_start]
+            self._buffer_start = offset
+
+    def close(self):
+        if self._file is not sys.stdin.buffer:
+            self._file.close()
+
+def open_source(filename, offset=0, length=None):
+    """Open filename ('-' for stdin) as a MappedSource or StreamSource, optionally a byte range of it"""
+    f = sys.stdin.buffer if filename == '-' else open(filename, 'rb')
+    if filename != '-' and stat.S_ISREG(os.fstat(f.fileno()).st_mode):
+        return MappedSource(f, offset, length)
+    if offset or length is not None:
+        raise ValueError(f"{filename} is not a regular file; byte ranges need a seekable file")
+    return StreamSource(f)
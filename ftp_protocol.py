@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Wire format shared by Simple_ftp_client.py and Simple_ftp_server.py
+
+Data segment: 32-bit sequence number, 16-bit checksum, 16-bit type (0101...), payload
+ACK:          32-bit sequence number, 16-bit zeros,    16-bit type (1010...)
+              With SACK negotiated in the SYN, the zeros are the number of
+              SACK blocks that follow: 32-bit first and one-past-last
+              sequence numbers of segments buffered above the cumulative ACK,
+              then a 16-bit checksum of the blocks
+SYN:          header with seq 0 and type 0011..., payload = SYN descriptor;
+              opens a transfer (or one stripe of a striped transfer) and is
+              echoed back unchanged by the server as the SYN-ACK
+FIN:          header with seq = number of segments and type 1100...,
+              payload = FIN descriptor; sent once every segment has been
+              sent and echoed back as the FIN-ACK once every segment has
+              been delivered, which closes the session on both ends
+RESET:        a bare FIN header (seq 0, zero checksum, no payload); the
+              server's answer to data from a client it has no session for
+              (never opened by a SYN, or closed for being idle). The client
+              gives up, since nothing it sends can be delivered any more
+RESUME:       header with seq 0 and type 0110..., payload = RESUME descriptor;
+              sent before the SYN to ask how much of the file the server
+              already has. The server answers with the same type, filling in
+              the checkpointed offset and a SHA-256 of the output up to it
+PROBE:        header with seq = payload length, zero checksum and type
+              1001..., payload = that many zero bytes; sent don't-fragment
+              to find the path MTU (--mss auto). The server echoes back
+              just the header
+PARITY:       header with the group's first seq and type 1111..., payload =
+              XOR parity of the group (see fec.py)
+SIGNATURES:   header with seq 0 and type 0000..., payload = SIGNATURES
+              descriptor (see delta.py); sent before the SYN to ask for a
+              page of block signatures of the server's copy of the file. The
+              server answers with the same type, the descriptor filled in and
+              the signatures after it
+The checksum of SYN, FIN, RESUME and SIGNATURES packets covers their payload.
+"""
+
+import hashlib
+import struct
+
+HEADER = struct.Struct('!IHH')
+DATA_PACKET_TYPE = 0b0101010101010101
+ACK_PACKET_TYPE = 0b1010101010101010
+SYN_PACKET_TYPE = 0b0011001100110011
+FIN_PACKET_TYPE = 0b1100110011001100
+RESUME_PACKET_TYPE = 0b0110011001100110
+PROBE_PACKET_TYPE = 0b1001100110011001
+FEC_PACKET_TYPE = 0b1111000011110000
+SIGNATURES_PACKET_TYPE = 0b0000111100001111
+
+# Transfer id, stripe index, stripe count, byte offset, byte length, total file size,
+# MSS, window size N, protocol (index into PROTOCOLS), flags, FEC group size (0 = no parity)
+SYN = struct.Struct('!IHHQQQIIBBH')
+# SYN flag: the byte range continues a partial output file, which must not be truncated
+SYN_RESUME = 0x01
+# SYN flag: the segments carry the framed, compressed stream of compression.py
+SYN_COMPRESS = 0x02
+# SYN flag: the segments carry the op stream of delta.py, to be applied to the server's old copy
+SYN_DELTA = 0x04
+# SYN flag: the Go-back-N receiver buffers out-of-order segments and reports them in SACK blocks
+SYN_SACK = 0x08
+# SYN flag: the segments carry the stream of many files of batch.py, written under the output path
+SYN_BATCH = 0x10
+# First and one-past-last wire sequence number of a run of segments buffered above the cumulative ACK
+SACK_BLOCK = struct.Struct('!II')
+SACK_CHECKSUM = struct.Struct('!H')
+MAX_SACK_BLOCKS = 16
+
+# Segments and bytes of this transfer (or stripe), so pipes need no size up front
+FIN = struct.Struct('!QQ')
+# File size, MSS, resume offset in bytes and SHA-256 of the bytes before it (zero in the request)
+RESUME = struct.Struct('!QIQ32s')
+
+PROTOCOLS = ('gbn', 'sr')
+
+# Length / file size in a SYN when the input is a pipe and its size is not known yet
+UNKNOWN_SIZE = 0xFFFFFFFFFFFFFFFF
+
+# Sequence numbers are unbounded segment indexes internally and wrap modulo 2^32
+# on the wire; each side maps them back relative to its window base.
+SEQ_MASK = 0xFFFFFFFF
+SEQ_HALF = (SEQ_MASK + 1) // 2
+
+def unwrap_seq(wire_seq, near):
+    """The unbounded sequence number nearest to near (either side) that wire_seq wraps from"""
+    return near + ((wire_seq - near + SEQ_HALF) & SEQ_MASK) - SEQ_HALF
+
+def prefix_digest(path, length, chunk_size=1024 * 1024):
+    """SHA-256 of the first length bytes of path, as carried in RESUME"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            digest.update(chunk)
+            length -= len(chunk)
+    return digest.digest()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Network emulator proxy for loopback experiments
+
+Sits between Simple_ftp_client.py and Simple_ftp_server.py and impairs the
+datagrams it relays, so WAN conditions can be reproduced on one machine:
+
+    python Simple_ftp_server.py 7735 output.txt 0
+    python netem_proxy.py 7736 127.0.0.1 7735 --delay 20 --jitter 5 --rate 50 --loss 0.01
+    python Simple_ftp_client.py 127.0.0.1 7736 testfile.txt 64 500
+
+Each client address gets its own upstream socket towards the server, so the
+server still sees one address per client. Both directions (client -> server
+and server -> client) have a one-way --delay / --jitter; the other
+impairments apply to the directions chosen with --impair (data path only by
+default). Impairments, in the order a packet meets them:
+- loss:      drop with probability --loss
+- rate:      serialize at --rate Mbit/s through a --queue-bytes tail-drop queue
+- delay:     --delay ms plus uniform +/- --jitter ms (jitter alone may reorder)
+- reorder:   with probability --reorder skip the delay and overtake earlier
+             packets (as in netem, needs --delay)
+- duplicate: deliver a second copy with probability --duplicate
+- corrupt:   flip one random payload bit with probability --corrupt; the
+             8-byte header is left alone, since the protocol checksum covers
+             only the payload (on a real path the UDP checksum catches the rest),
+             so header-only packets such as ACKs are never corrupted
+--seed makes the random impairments reproducible.
+"""
+
+import sys
+import signal
+import random
+import argparse
+import asyncio
+
+from ftp_protocol import HEADER
+
+HEADER_SIZE = HEADER.size
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="UDP proxy that injects delay, jitter, bandwidth limits, loss, reordering, "
+                    "duplication and corruption",
+        usage="python netem_proxy.py <listen-port#> <server-host-name> <server-port#> [options]")
+    parser.add_argument('listen_port', type=int)
+    parser.add_argument('server_host')
+    parser.add_argument('server_port', type=int)
+    parser.add_argument('--delay', type=float, default=0,
+                        help="one-way delay in milliseconds, applied in both directions (default: 0)")
+    parser.add_argument('--jitter', type=float, default=0,
+                        help="uniform +/- jitter on the delay in milliseconds (default: 0)")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="bandwidth limit in Mbit/s for impaired directions; 0 = unlimited (default)")
+    parser.add_argument('--queue-bytes', type=int, default=256 * 1024,
+                        help="bottleneck queue size; packets arriving to a full queue are dropped (default: 256 KiB)")
+    parser.add_argument('--loss', type=float, default=0,
+                        help="packet loss probability (default: 0)")
+    parser.add_argument('--reorder', type=float, default=0,
+                        help="probability that a packet skips the delay and overtakes earlier ones (default: 0)")
+    parser.add_argument('--duplicate', type=float, default=0,
+                        help="probability that a packet is delivered twice (default: 0)")
+    parser.add_argument('--corrupt', type=float, default=0,
+                        help="probability that one random payload bit of a packet is flipped (default: 0)")
+    parser.add_argument('--impair', choices=['forward', 'reverse', 'both'], default='forward',
+                        help="directions that get loss, rate, reorder, duplicate and corrupt: forward = "
+                             "client -> server data, reverse = server -> client ACKs (default: forward)")
+    parser.add_argument('--seed', type=int,
+                        help="random seed for reproducible impairments")
+    parser.add_argument('--idle-timeout', type=float, default=60,
+                        help="forget a client after this many seconds without packets (default: 60)")
+    return parser.parse_args()
+
+class Link:
+    """One direction of the emulated path"""
+
+    def __init__(self, name, args, impaired, rng, loop):
+        self.name = name
+        self.rng = rng
+        self.loop = loop
+        self.delay = args.delay / 1000
+        self.jitter = args.jitter / 1000
+        self.loss = args.loss if impaired else 0
+        self.rate = args.rate * 1e6 / 8 if impaired else 0  # bytes per second
+        self.queue_bytes = args.queue_bytes
+        self.reorder = args.reorder if impaired else 0
+        self.duplicate = args.duplicate if impaired else 0
+        self.corrupt = args.corrupt if impaired else 0
+        self.busy_until = 0.0  # when the bottleneck finishes serializing its queue
+
+        self.packets = 0
+        self.delivered = 0
+        self.lost = 0
+        self.queue_drops = 0
+        self.reordered = 0
+        self.duplicated = 0
+        self.corrupted = 0
+
+    def submit(self, data, deliver):
+        """Pass data through the link; deliver(data) is called when (and if) it comes out"""
+        self.packets += 1
+        rng = self.rng
+        if self.loss and rng.random() < self.loss:
+            self.lost += 1
+            return
+
+        now = self.loop.time()
+        departure = now
+        if self.rate:
+            start = max(now, self.busy_until)
+            if (start - now) * self.rate + len(data) > self.queue_bytes:
+                self.queue_drops += 1
+                return
+            departure = start + len(data) / self.rate
+            self.busy_until = departure
+
+        delay = self.delay
+        if self.jitter:
+            delay = max(0.0, delay + rng.uniform(-self.jitter, self.jitter))
+        if self.reorder and rng.random() < self.reorder:
+            self.reordered += 1
+            delay = 0.0
+
+        copies = 1
+        if self.duplicate and rng.random() < self.duplicate:
+            self.duplicated += 1
+            copies = 2
+        for _ in range(copies):
+            packet = data
+            # Header-only packets (ACKs, bare FINs) have no payload to corrupt
+            if self.corrupt and len(data) > HEADER_SIZE and rng.random() < self.corrupt:
+                self.corrupted += 1
+                packet = bytearray(data)
+                bit = rng.randrange(HEADER_SIZE * 8, len(packet) * 8)
+                packet[bit // 8] ^= 1 << (bit % 8)
+                packet = bytes(packet)
+            self.delivered += 1
+            arrival = departure + delay
+            if arrival <= now:
+                deliver(packet)
+            else:
+                self.loop.call_at(arrival, deliver, packet)
+
+    def summary(self):
+        return (f"{self.name}: {self.packets} packets in, {self.delivered} delivered, {self.lost} lost, "
+                f"{self.queue_drops} queue drops, {self.reordered} reordered, {self.duplicated} duplicated, "
+                f"{self.corrupted} corrupted")
+
+class Upstream(asyncio.DatagramProtocol):
+    """Socket connected to the server on behalf of one client"""
+
+    def __init__(self, proxy, client_address):
+        self.proxy = proxy
+        self.client_address = client_address
+        self.transport = None
+        self.waiting = []  # packets that arrived before the socket was ready
+        self.last_packet_time = proxy.loop.time()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        for packet in self.waiting or ():
+            transport.sendto(packet)
+        self.waiting = None
+
+    def send(self, packet):
+        if self.transport is None:
+            if self.waiting is not None:
+                self.waiting.append(packet)
+        elif not self.transport.is_closing():
+            self.transport.sendto(packet)
+
+    def datagram_received(self, packet, _):
+        self.last_packet_time = self.proxy.loop.time()
+        self.proxy.reverse.submit(packet, self.reply)
+
+    def reply(self, packet):
+        self.proxy.transport.sendto(packet, self.client_address)
+
+    def error_received(self, exc):
+        pass  # e.g. ICMP port unreachable while the server is not up
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+        self.waiting = None
+
+class ProxyProtocol(asyncio.DatagramProtocol):
+    """Listening socket for clients; relays through the forward and reverse links"""
+
+    def __init__(self, args, loop):
+        self.args = args
+        self.loop = loop
+        self.server_address = (args.server_host, args.server_port)
+        rng = random.Random(args.seed)
+        self.forward = Link('client -> server', args, args.impair in ('forward', 'both'), rng, loop)
+        self.reverse = Link('server -> client', args, args.impair in ('reverse', 'both'), rng, loop)
+        self.transport = None
+        self.upstreams = {}
+        self.timer = loop.call_later(1.0, self.tick)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, packet, client_address):
+        upstream = self.upstreams.get(client_address)
+        if upstream is None:
+            upstream = Upstream(self, client_address)
+            self.upstreams[client_address] = upstream
+            self.loop.create_task(self.loop.create_datagram_endpoint(
+                lambda: upstream, remote_addr=self.server_address))
+            print(f"Relaying {client_address[0]}:{client_address[1]} -> "
+                  f"{self.server_address[0]}:{self.server_address[1]}")
+        upstream.last_packet_time = self.loop.time()
+        self.forward.submit(packet, upstream.send)
+
+    def error_received(self, exc):
+        pass
+
+    def tick(self):
+        now = self.loop.time()
+        for address, upstream in list(self.upstreams.items()):
+            if now - upstream.last_packet_time > self.args.idle_timeout:
+                upstream.close()
+                del self.upstreams[address]
+        self.timer = self.loop.call_later(1.0, self.tick)
+
+    def close_all(self):
+        self.timer.cancel()
+        for upstream in self.upstreams.values():
+            upstream.close()
+        self.upstreams.clear()
+        print(self.forward.summary())
+        print(self.reverse.summary())
+
+async def serve(args):
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: ProxyProtocol(args, loop), local_addr=('0.0.0.0', args.listen_port))
+
+    def signal_handler():
+        print("\n\nShutting down proxy...")
+        if not done.done():
+            done.set_exception(KeyboardInterrupt())
+
+    loop.add_signal_handler(signal.SIGINT, signal_handler)
+
+    try:
+        await done
+    finally:
+        protocol.close_all()
+        transport.close()
+
+def main():
+    args = parse_args()
+
+    print(f"Proxy listening on port {args.listen_port}, relaying to {args.server_host}:{args.server_port}")
+    print(f"Delay: {args.delay:g} ms +/- {args.jitter:g} ms, rate: {args.rate or 'unlimited'} Mbit/s, "
+          f"loss: {args.loss}, reorder: {args.reorder}, duplicate: {args.duplicate}, corrupt: {args.corrupt} "
+          f"({args.impair})")
+    print("Press Ctrl+C to stop\n")
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Receiver write path for Simple_ftp_server.py
+
+ReceiverStorage replaces one output_file.write() per segment with:
+- coalescing: in-order data is copied into one reusable buffer and written with
+  a single os.pwrite() when it fills (writes are aligned to the buffer size)
+- pwrite mode: segments accepted out of order can go straight to their file
+  offset with write_at(); skip() later moves the in-order point past them
+- preallocation of the output file with posix_fallocate when the size is known
+- an fsync policy: 'none', 'flush' (on every explicit flush()) or 'close'
+- counters for write syscalls, bytes written and fsyncs
+A storage can also cover one byte range of a shared output file (base_offset,
+truncate=False), which is how the stripes of a striped transfer are reassembled;
+prepare_output() creates and preallocates that file once for all stripes.
+
+A checkpoint is a small JSON sidecar (<output>.ckpt) recording how far the
+output is contiguous on disk, so an interrupted transfer can be resumed
+from there; write_checkpoint() replaces it atomically.
+"""
+
+import json
+import os
+
+FSYNC_POLICIES = ('none', 'flush', 'close')
+WRITE_MODES = ('coalesce', 'pwrite')
+
+class ReceiverStorage:
+    """Output file written through a coalescing buffer and positional writes"""
+
+    def __init__(self, path, mode='coalesce', buffer_size=1024 * 1024, fsync='none', base_offset=0, truncate=True):
+        if mode not in WRITE_MODES:
+            raise ValueError(f"unknown write mode: {mode}")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy: {fsync}")
+        self.path = path
+        self.mode = mode
+        self.fsync_policy = fsync
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | (os.O_TRUNC if truncate else 0), 0o644)
+        self.base_offset = base_offset
+
+        self.buffer_size = buffer_size
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = base_offset  # file offset of self._buffer[0]
+        self._fill = 0
+        self._end = base_offset  # highest offset written or buffered
+        self._preallocated = 0
+
+        self.write_syscalls = 0
+        self.bytes_written = 0
+        self.fsync_count = 0
+
+    @property
+    def position(self):
+        """File offset where the next in-order byte goes"""
+        return self._start + self._fill
+
+    def preallocate(self, size):
+        """Reserve size bytes on disk up front (no-op where posix_fallocate is unavailable)"""
+        if size > 0 and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(self.fd, 0, size)
+                self._preallocated = size
+            except OSError:
+                pass  # e.g. filesystem without fallocate support
+
+    def _pwrite(self, data, offset):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.fd, view, offset)
+            self.write_syscalls += 1
+            self.bytes_written += written
+            view = view[written:]
+            offset += written
+        self._end = max(self._end, offset)
+
+    def _write_buffer(self):
+        if self._fill:
+            self._pwrite(self._view[:self._fill], self._start)
+            self._start += self._fill
+            self._fill = 0
+
+    def append(self, data):
+        """Write in-order data at the current position, coalescing small writes"""
+        n = len(data)
+        if n >= self.buffer_size:
+            self._write_buffer()
+            self._pwrite(data, self._start)
+            self._start += n
+            return
+
+        # Cut flushes at buffer_size boundaries so large writes stay aligned
+        limit = self.buffer_size - self._start % self.buffer_size
+        if self._fill + n >= limit:
+            head = limit - self._fill
+            self._buffer[self._fill:limit] = data[:head]
+            self._fill = limit
+            self._write_buffer()
+            data = data[head:]
+            n -= head
+        self._buffer[self._fill:self._fill + n] = data
+        self._fill += n
+        self._end = max(self._end, self.position)
+
+    def write_at(self, offset, data):
+        """Write data accepted out of order directly at its offset from base_offset (pwrite mode)"""
+        self._pwrite(data, self.base_offset + offset)
+
+    def skip(self, length):
+        """Advance the in-order position over length bytes already placed by write_at()"""
+        self._write_buffer()
+        self._start += length
+
+    def flush(self):
+        self._write_buffer()
+        if self.fsync_policy == 'flush':
+            self._fsync()
+
+    def _fsync(self):
+        os.fsync(self.fd)
+        self.fsync_count += 1
+
+    def close(self):
+        if self.fd is None:
+            return
+        self._write_buffer()
+        if self._preallocated > self._end:
+            os.ftruncate(self.fd, self._end)  # drop unused preallocated space
+        if self.fsync_policy != 'none':
+            self._fsync()
+        os.close(self.fd)
+        self.fd = None
+
+    def stats(self):
+        return {
+            'write_mode': self.mode,
+            'bytes_written': self.bytes_written,
+            'write_syscalls': self.write_syscalls,
+            'bytes_per_syscall': self.bytes_written / self.write_syscalls if self.write_syscalls else 0,
+            'fsync_policy': self.fsync_policy,
+            'fsync_count': self.fsync_count,
+        }
+
+def prepare_output(path, size):
+    """Create (truncate) path and reserve size bytes, for storages that share it with truncate=False"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if size > 0 and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError:
+                os.ftruncate(fd, size)
+        else:
+            os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+def checkpoint_path(path):
+    return path + '.ckpt'
+
+def write_checkpoint(path, **fields):
+    """Atomically replace the checkpoint of output file path with fields"""
+    target = checkpoint_path(path)
+    temp = target + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump(fields, f)
+    os.replace(temp, target)
+
+def read_checkpoint(path):
+    """The checkpoint fields of output file path, or None if there is no readable checkpoint"""
+    try:
+        with open(checkpoint_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def remove_checkpoint(path):
+    try:
+        os.remove(checkpoint_path(path))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Preallocated ring of outgoing segments for the sliding-window sender
+
+Segment seq lives in slot seq % capacity, so with capacity >= window size the
+slots of in-flight segments never collide. Each slot is a bytearray sized for
+header + MSS; headers are written in place with struct.pack_into and payloads
+are copied straight from a memoryview of the file, so building a segment
+allocates nothing. Sliding the window is just moving base - slots below it are
+simply overwritten when reused.
+"""
+
+from checksum import compute_checksum
+from ftp_protocol import HEADER, DATA_PACKET_TYPE, SEQ_MASK
+
+class SegmentRing:
+    """Fixed-size ring of preallocated segment slots, indexed by sequence number"""
+
+    def __init__(self, capacity, mss):
+        self.capacity = capacity
+        self.slots = [bytearray(HEADER.size + mss) for _ in range(capacity)]
+        self.views = [memoryview(slot) for slot in self.slots]
+        self.lengths = [0] * capacity
+        # First-transmission time per slot, None once retransmitted (Karn's rule)
+        self.sent_at = [None] * capacity
+
+    def fill(self, seq, payload):
+        """Build the segment for seq from a payload memoryview; returns a view of it"""
+        i = seq % self.capacity
+        slot = self.slots[i]
+        end = HEADER.size + len(payload)
+        slot[HEADER.size:end] = payload
+        HEADER.pack_into(slot, 0, seq & SEQ_MASK, compute_checksum(payload), DATA_PACKET_TYPE)
+        self.lengths[i] = end
+        return self.views[i][:end]
+
+    def segment(self, seq):
+        """View of the already-built segment for seq (valid while seq is in flight)"""
+        i = seq % self.capacity
+        return self.views[i][:self.lengths[i]]
@@ -0,0 +1,71 @@
+import errno
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_sender import BACKOFF_MIN, BACKOFF_MAX, GSOBackend, SendtoBackend
+
+ADDRESS = ('127.0.0.1', 7735)
+
+class FailingSocket:
+    """Takes datagrams until its errors list has an errno for the next call"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.datagrams = []
+
+    def fail(self):
+        if self.errors:
+            code = self.errors.pop(0)
+            if code is not None:
+                raise OSError(code, os.strerror(code))  # subclassed by errno, e.g. BlockingIOError
+
+    def sendto(self, data, address):
+        self.fail()
+        self.datagrams.append(bytes(data))
+
+    def sendmsg(self, buffers, ancdata, flags, address):
+        self.fail()
+        self.datagrams.extend(bytes(b) for b in buffers)
+
+def segments(count, size=100):
+    return [bytes([i]) * size for i in range(count)]
+
+@pytest.mark.parametrize('count', [1, 10])  # plain sendto and a sendmsg batch
+def test_enobufs_backs_off_and_recovers(count):
+    sock = FailingSocket(errno.ENOBUFS, errno.ENOBUFS)
+    backend = GSOBackend(sock, ADDRESS)
+    assert backend.send(segments(count)) == 0
+    assert backend.backoff == BACKOFF_MIN
+    assert backend.send(segments(count)) == 0
+    assert backend.backoff == 2 * BACKOFF_MIN
+    assert backend.send(segments(count)) == count
+    assert backend.backoff == 0
+    assert not backend.fallback
+
+def test_enobufs_backoff_is_capped():
+    backend = SendtoBackend(FailingSocket(*[errno.ENOBUFS] * 20), ADDRESS)
+    for _ in range(20):
+        assert backend.send(segments(3)) == 0
+    assert backend.backoff == BACKOFF_MAX
+
+def test_full_socket_buffer_waits_for_writability():
+    backend = GSOBackend(FailingSocket(errno.EAGAIN), ADDRESS)
+    assert backend.send(segments(10)) == 0
+    assert backend.backoff == 0
+
+@pytest.mark.parametrize('backend_type, count', [(SendtoBackend, 3), (GSOBackend, 1), (GSOBackend, 10)])
+def test_other_errors_are_raised(backend_type, count):
+    backend = backend_type(FailingSocket(errno.ECONNREFUSED), ADDRESS)
+    with pytest.raises(ConnectionRefusedError):
+        backend.send(segments(count))
+
+def test_gso_rejection_falls_back_to_sendto():
+    sock = FailingSocket(errno.EIO)
+    backend = GSOBackend(sock, ADDRESS)
+    assert backend.send(segments(10)) == 10
+    assert backend.fallback
+    assert sock.datagrams == segments(10)
@@ -0,0 +1,16 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ftp_protocol import SEQ_MASK, unwrap_seq
+
+def test_unwrap_seq_maps_either_side_of_near():
+    near = 5 * (SEQ_MASK + 1) + 10
+    for seq in (near - 1000, near, near + 1000):
+        assert unwrap_seq(seq & SEQ_MASK, near) == seq
+
+def test_unwrap_seq_across_the_wrap():
+    near = SEQ_MASK + 3
+    assert unwrap_seq(SEQ_MASK - 2, near) == SEQ_MASK - 2
+    assert unwrap_seq(7, near) == SEQ_MASK + 8
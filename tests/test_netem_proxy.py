@@ -0,0 +1,43 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ftp_protocol import HEADER, ACK_PACKET_TYPE, DATA_PACKET_TYPE
+from netem_proxy import Link
+
+class ImmediateLoop:
+    """Just enough of an event loop for a Link without delay or rate limiting"""
+
+    def time(self):
+        return 0.0
+
+    def call_at(self, when, callback, *args):
+        callback(*args)
+
+def corrupting_link(seed=1):
+    args = argparse.Namespace(delay=0, jitter=0, loss=0, rate=0, queue_bytes=256 * 1024, reorder=0,
+                              duplicate=0, corrupt=1.0)
+    return Link('forward', args, True, random.Random(seed), ImmediateLoop())
+
+def test_ack_passes_corrupting_link_unchanged():
+    link = corrupting_link()
+    delivered = []
+    for seq in range(1000):
+        ack = HEADER.pack(seq, 0, ACK_PACKET_TYPE)
+        link.submit(ack, delivered.append)
+        assert delivered[-1] == ack
+    assert link.corrupted == 0
+
+def test_data_corruption_leaves_header_alone():
+    link = corrupting_link()
+    delivered = []
+    for seq in range(1000):
+        segment = HEADER.pack(seq, 0x1234, DATA_PACKET_TYPE) + bytes(32)
+        link.submit(segment, delivered.append)
+        out = delivered[-1]
+        assert out[:HEADER.size] == segment[:HEADER.size]
+        assert out[HEADER.size:] != segment[HEADER.size:]
+    assert link.corrupted == 1000
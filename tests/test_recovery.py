@@ -0,0 +1,58 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEGMENTS = 400
+MSS = 1000
+WINDOW = 64
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def run_through_reordering_proxy(tmp_path, *client_args, server_args=()):
+    source = tmp_path / 'source.bin'
+    source.write_bytes(os.urandom(SEGMENTS * MSS))
+    output = tmp_path / 'output.bin'
+    server_port, proxy_port = free_port(), free_port()
+    server = subprocess.Popen([sys.executable, os.path.join(REPO, 'Simple_ftp_server.py'), str(server_port),
+                               str(output), '0', '--once', *server_args],
+                              cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    proxy = subprocess.Popen([sys.executable, os.path.join(REPO, 'netem_proxy.py'), str(proxy_port), '127.0.0.1',
+                              str(server_port), '--delay', '5', '--jitter', '4', '--reorder', '0.05', '--seed', '3'],
+                             cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(0.5)
+        subprocess.run([sys.executable, os.path.join(REPO, 'Simple_ftp_client.py'), '127.0.0.1', str(proxy_port),
+                        str(source), str(WINDOW), str(MSS), *client_args],
+                       cwd=tmp_path, stdout=subprocess.DEVNULL, check=True, timeout=120)
+        server.wait(timeout=10)
+    finally:
+        for process in (proxy, server):
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+                process.wait(timeout=10)
+    assert output.read_bytes() == source.read_bytes()
+    with open(tmp_path / 'transfer_stats.jsonl') as f:
+        return json.loads(f.readlines()[-1])
+
+@pytest.mark.parametrize('client_args, server_args', [
+    ((), ()),
+    (('--congestion', 'aimd'), ()),
+    (('--sack',), ()),
+    (('--protocol', 'sr'), ('--protocol', 'sr')),
+])
+def test_reordering_does_not_multiply_fast_retransmissions(tmp_path, client_args, server_args):
+    stats = run_through_reordering_proxy(tmp_path, *client_args, server_args=server_args)
+    # A recovery resends at most one window; each further hole a partial ACK leaves costs one segment
+    cap = stats['fast_recovery_count'] * WINDOW + stats['fast_retransmit_count']
+    assert stats['fast_retransmissions'] <= cap
+    assert stats['fast_retransmissions'] <= 20 * SEGMENTS